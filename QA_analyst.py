@@ -1,9 +1,15 @@
 import os
-from openai import OpenAI
 import json
 import traceback
 from dotenv import load_dotenv
 import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from llm_cache import cache
+from text_chunker import iter_chunks, iter_stream_chunks, count_tokens
+import metrics
+from rate_limiter import rate_limiter, PRIORITY_FINAL, PRIORITY_CHUNK
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -12,134 +18,395 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Initialize the OpenAI client with your API key
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
-def split_text(text, max_size=6000):
-    """Splits text into chunks that are less than max_size tokens."""
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_size = 0
-    for word in words:
-        word_length = len(word)  # Approximate token count
-        if current_size + word_length + 1 > max_size:  # +1 for the space
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_size = word_length
-        else:
-            current_chunk.append(word)
-            current_size += word_length + 1
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    return chunks
-
-def summarize_chunk(text, model="gpt-4o-mini", max_tokens=2000):
-    """First round summarization: Summarize the text focusing on key takeaways with details."""
-    prompt = (
-        "You are a professional blockchain analyst. "
-        "Your task is to summarize the following text, focusing on key takeaways while keeping as much detail and figures as possible. "
-        "Include all specific data points, quotes, statistics, and any projections mentioned. "
-        "Ensure that the summary is comprehensive and includes all important points."
-        "Present the summary in a structured bullet point format."
-    )
-    
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": prompt
-            },
-            {
-                "role": "user",
-                "content": f"Please summarize the following text:\n\n{text}"
-            }
-        ],
-        max_tokens=max_tokens,
-        temperature=0.3
+# Created on first use so importing this module doesn't load the openai package
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        # Several pool threads can ask at once; only one builds the client
+        with _client_lock:
+            if client is None:
+                client = _build_client()
+    return client
+
+def _build_client():
+    import httpx
+    from openai import OpenAI
+    return OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        # Retries are scheduled by rate_limiter so they respect the shared limits
+        max_retries=0,
+        http_client=httpx.Client(event_hooks={'response': [metrics.count_retryable_response]})
     )
-    summary = response.choices[0].message.content.strip()
-    print("Chunk Summary:", summary)  # Optional: Print each summary for verification
-    return summary
 
-def extract_key_takeaways(summaries, report_type="analyst", model="gpt-4", max_tokens=2500):
-    """Second round summarization: Extract key takeaways from the summaries in the specified format."""
-    combined_summaries = "\n\n".join(summaries)
-    
-    if report_type == "analyst":
-        prompt = (
-            "You are a professional blockchain analyst preparing a report for senior stakeholders. "
-            "Your task is to extract key takeaways from the following summaries. "
-            "Present each key takeaway as a bolded heading summarizing the key idea, followed by a detailed explanation and analysis. "
-            "Do not refer to 'the speaker' or 'they'; instead, focus directly on the subject matter. "
-            "Include specific figures, statistics, data points, and examples from the text to support each point. "
-            "Avoid duplication by ensuring each bullet point addresses a unique aspect of the content. "
-            "Use a formal, analytical tone appropriate for a professional report intended for senior stakeholders. "
-            "Ensure clarity and conciseness in your writing."
-        )
-    elif report_type == "medium":
-        prompt = (
-            "You are a blockchain enthusiast writing an engaging Medium post about a YouTube video. "
-            "Your task is to create an interesting yet professional article based on the following summaries. "
-            "Structure the article with an attention-grabbing introduction, 3-5 main points with subheadings, and a conclusion. "
-            "Use a conversational tone that's accessible to a general audience while maintaining professionalism. "
-            "Include specific examples, anecdotes, and data points from the summaries to illustrate your points. "
-            "Engage the reader by asking thought-provoking questions and providing insights. "
-            "Aim for a balance between being informative and entertaining. "
-            "Conclude with a call-to-action or a reflection on the implications of the content."
-        )
-    else:
+# Number of chunks summarized in parallel
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', '4'))
+
+# Token budget for the combined summaries fed into the final extract_key_takeaways
+# prompt, per model. Longer inputs are first merged down level by level.
+REDUCE_INPUT_BUDGETS = {
+    "gpt-4": 5000,
+    "gpt-4o": 60000,
+    "gpt-4o-mini": 60000,
+}
+MAX_REDUCE_LEVELS = 6
+
+SUMMARIZE_PROMPT = (
+    "You are a professional blockchain analyst. "
+    "Your task is to summarize the following text, focusing on key takeaways while keeping as much detail and figures as possible. "
+    "Include all specific data points, quotes, statistics, and any projections mentioned. "
+    "Ensure that the summary is comprehensive and includes all important points."
+    "Present the summary in a structured bullet point format."
+)
+
+MERGE_PROMPT = (
+    "You are a professional blockchain analyst. "
+    "The following are summaries of consecutive sections of the same transcript. "
+    "Merge them into a single summary in a structured bullet point format. "
+    "Keep all specific data points, quotes, statistics, and projections; remove only duplication."
+)
+
+TAKEAWAYS_PROMPTS = {
+    "analyst": (
+        "You are a professional blockchain analyst preparing a report for senior stakeholders. "
+        "Your task is to extract key takeaways from the following summaries. "
+        "Present each key takeaway as a bolded heading summarizing the key idea, followed by a detailed explanation and analysis. "
+        "Do not refer to 'the speaker' or 'they'; instead, focus directly on the subject matter. "
+        "Include specific figures, statistics, data points, and examples from the text to support each point. "
+        "Avoid duplication by ensuring each bullet point addresses a unique aspect of the content. "
+        "Use a formal, analytical tone appropriate for a professional report intended for senior stakeholders. "
+        "Ensure clarity and conciseness in your writing."
+    ),
+    "medium": (
+        "You are a blockchain enthusiast writing an engaging Medium post about a YouTube video. "
+        "Your task is to create an interesting yet professional article based on the following summaries. "
+        "Structure the article with an attention-grabbing introduction, 3-5 main points with subheadings, and a conclusion. "
+        "Use a conversational tone that's accessible to a general audience while maintaining professionalism. "
+        "Include specific examples, anecdotes, and data points from the summaries to illustrate your points. "
+        "Engage the reader by asking thought-provoking questions and providing insights. "
+        "Aim for a balance between being informative and entertaining. "
+        "Conclude with a call-to-action or a reflection on the implications of the content."
+    ),
+}
+
+TITLE_PROMPTS = {
+    "analyst": (
+        "Based on the following summary, generate a concise title (max 8 words) and a one-sentence subtitle "
+        "that captures the essence of the professional analyst report. Return only the JSON object without any markdown formatting."
+    ),
+    "medium": (
+        "Based on the following summary, generate an engaging and catchy title (max 10 words) and a one-sentence subtitle "
+        "that would attract readers to a Medium post about this topic. The title should be intriguing but not clickbait. "
+        "Return only the JSON object without any markdown formatting."
+    ),
+}
+
+DEFAULT_TITLE = {"title": "Comprehensive Analysis Report", "subtitle": "Detailed summary and key insights from your transcript"}
+
+def takeaways_prompt(report_type):
+    if report_type not in TAKEAWAYS_PROMPTS:
         raise ValueError("Invalid report type. Choose 'analyst' or 'medium'.")
+    return TAKEAWAYS_PROMPTS[report_type]
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": f"Please create the content based on these summaries:\n\n{combined_summaries}"}
-        ],
-        max_tokens=max_tokens,
-        temperature=0.4  # Slightly increased for more creativity in the Medium post
-    )
+def title_prompt(report_type):
+    if report_type not in TITLE_PROMPTS:
+        raise ValueError("Invalid report type. Choose 'analyst' or 'medium'.")
+    return TITLE_PROMPTS[report_type]
+
+def parse_title(content):
+    """Parse the title/subtitle JSON, tolerating markdown code fences."""
+    content = content.replace('```json', '').replace('```', '').strip()
+    return json.loads(content)
+
+def completion_key(function_name, model, system_prompt, user_content, max_tokens, temperature):
+    """Cache key of a chat completion, shared by the sync and async pipelines."""
+    return cache.make_key(function_name, model, system_prompt, user_content, max_tokens, temperature)
+
+def cached_completion(key, function_name, parse=None):
+    """The cached completion for key, run through parse if given, or None.
+
+    An entry that parse rejects with ValueError is dropped, so a malformed
+    completion isn't served again.
+    """
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    try:
+        result = parse(cached) if parse else cached
+    except ValueError:
+        cache.delete(key)
+        return None
+    logger.info(f"Cache hit for {function_name}")
+    return result
+
+def _chat_completion(function_name, model, system_prompt, user_content, max_tokens, temperature, use_cache=True,
+                     priority=PRIORITY_FINAL, parse=None):
+    """Run a chat completion through the shared rate limiter, serving repeats from the local cache.
+
+    With parse, the parsed content is returned, and content that fails to parse
+    raises ValueError and is not cached.
+    """
+    key = completion_key(function_name, model, system_prompt, user_content, max_tokens, temperature)
+    if use_cache:
+        cached = cached_completion(key, function_name, parse)
+        if cached is not None:
+            return cached
+
+    estimated_tokens = count_tokens(system_prompt, model) + count_tokens(user_content, model) + max_tokens
+    try:
+        response = rate_limiter.call(model, estimated_tokens, priority, lambda: get_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature
+        ))
+    except Exception:
+        metrics.openai_requests.inc(model=model, operation=function_name, outcome="error")
+        raise
+    metrics.openai_requests.inc(model=model, operation=function_name, outcome="ok")
+    metrics.record_usage(model, response.usage)
     content = response.choices[0].message.content.strip()
-    return content
+    result = parse(content) if parse else content
+    if use_cache:
+        cache.set(key, content)
+    return result
 
-def generate_title_subtitle(summary, report_type="analyst", model="gpt-4", max_tokens=100):
-    """Generate a title and subtitle based on the final summary and report type."""
-    if report_type == "analyst":
-        prompt = (
-            "Based on the following summary, generate a concise title (max 8 words) and a one-sentence subtitle "
-            "that captures the essence of the professional analyst report. Return only the JSON object without any markdown formatting."
-        )
-    elif report_type == "medium":
-        prompt = (
-            "Based on the following summary, generate an engaging and catchy title (max 10 words) and a one-sentence subtitle "
-            "that would attract readers to a Medium post about this topic. The title should be intriguing but not clickbait. "
-            "Return only the JSON object without any markdown formatting."
-        )
-    else:
-        raise ValueError("Invalid report type. Choose 'analyst' or 'medium'.")
+def _chat_completion_stream(function_name, model, system_prompt, user_content, max_tokens, temperature, use_cache=True,
+                            priority=PRIORITY_FINAL):
+    """Streaming variant of _chat_completion: yields content deltas as they arrive.
 
+    A cached completion is yielded as a single delta. The assembled text is
+    cached once the stream finishes.
+    """
+    key = completion_key(function_name, model, system_prompt, user_content, max_tokens, temperature)
+    if use_cache:
+        cached = cached_completion(key, function_name)
+        if cached is not None:
+            yield cached
+            return
+
+    prompt_tokens = count_tokens(system_prompt, model) + count_tokens(user_content, model)
+    parts = []
     try:
-        response = client.chat.completions.create(
+        stream = rate_limiter.call(model, prompt_tokens + max_tokens, priority, lambda: get_client().chat.completions.create(
             model=model,
             messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": summary}
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
             ],
             max_tokens=max_tokens,
-            temperature=0.7
+            temperature=temperature,
+            stream=True
+        ))
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception:
+        metrics.openai_requests.inc(model=model, operation=function_name, outcome="error")
+        raise
+    metrics.openai_requests.inc(model=model, operation=function_name, outcome="ok")
+    content = "".join(parts).strip()
+    # Streamed responses carry no usage block, so count the tokens locally
+    metrics.record_tokens(model, prompt_tokens, count_tokens(content, model))
+    if use_cache:
+        cache.set(key, content)
+
+def split_text(text, max_size=None, model="gpt-4o-mini", overlap=None):
+    """Splits text into chunks of at most max_size tokens (defaults to the model's chunk budget)."""
+    return list(iter_chunks(text, model=model, max_tokens=max_size, overlap_tokens=overlap))
+
+def summarize_chunk(text, model="gpt-4o-mini", max_tokens=2000, use_cache=True):
+    """First round summarization: Summarize the text focusing on key takeaways with details."""
+    with metrics.timed("summarize_chunk"):
+        summary = _chat_completion(
+            "summarize_chunk", model, SUMMARIZE_PROMPT,
+            f"Please summarize the following text:\n\n{text}",
+            max_tokens=max_tokens,
+            temperature=0.3,
+            use_cache=use_cache,
+            priority=PRIORITY_CHUNK
+        )
+    logger.debug(f"Chunk Summary: {summary}")
+    return summary
+
+def summarize_chunks(chunks, max_workers=None):
+    """Summarize chunks concurrently, yielding (index, summary) as each chunk finishes."""
+    max_workers = max_workers or SUMMARY_WORKERS
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {metrics.submit(executor, summarize_chunk, chunk): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Don't keep paying for chunks nobody will read if the stream is abandoned
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _summarize_with_checkpoint(chunk, checkpoint):
+    summary = checkpoint.get(chunk)
+    if summary is None:
+        summary = summarize_chunk(chunk)
+        checkpoint.save(chunk, summary)
+    return summary
+
+def summarize_stream(pieces, max_workers=None, checkpoint=None):
+    """Chunk and summarize text pieces while they are still being produced.
+
+    pieces is consumed in a background thread, so summarization of early chunks
+    overlaps with producing later pieces (e.g. transcribing the rest of a video).
+    Yields events in arrival order:
+      ("segment", text)          - a piece was received
+      ("summary", index, text)   - chunk `index` was summarized
+      ("chunked", total)         - all pieces consumed; total chunk count is known
+    If a checkpoint is given, chunks it already holds are not summarized again.
+    """
+    max_workers = max_workers or SUMMARY_WORKERS
+    events = queue.Queue()
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+
+    def tap():
+        for piece in pieces:
+            if stop.is_set():
+                return
+            events.put(("segment", piece))
+            yield piece
+
+    def feed():
+        try:
+            total = 0
+            for index, chunk in enumerate(iter_stream_chunks(tap())):
+                if stop.is_set():
+                    return
+                if checkpoint is not None:
+                    future = metrics.submit(executor, _summarize_with_checkpoint, chunk, checkpoint)
+                else:
+                    future = metrics.submit(executor, summarize_chunk, chunk)
+                future.add_done_callback(lambda f, i=index: events.put(("summary", i, f)))
+                total += 1
+            events.put(("chunked", total))
+        except Exception as e:
+            events.put(("error", e))
+
+    metrics.start_thread(feed)
+    try:
+        total, done = None, 0
+        while total is None or done < total:
+            event = events.get()
+            if event[0] == "error":
+                raise event[1]
+            if event[0] == "summary":
+                done += 1
+                yield "summary", event[1], event[2].result()
+            else:
+                if event[0] == "chunked":
+                    total = event[1]
+                yield event
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def merge_summaries(summaries, model="gpt-4o-mini", max_tokens=2000, use_cache=True):
+    """Intermediate reduction: merge summaries of consecutive sections into one summary."""
+    with metrics.timed("merge_summaries"):
+        return _chat_completion(
+            "merge_summaries", model, MERGE_PROMPT,
+            "Please merge the following summaries:\n\n" + "\n\n".join(summaries),
+            max_tokens=max_tokens,
+            temperature=0.3,
+            use_cache=use_cache
         )
-        
-        content = response.choices[0].message.content.strip()
-        content = content.replace('```json', '').replace('```', '').strip()
-        result = json.loads(content)
-        return result
+
+def _batch_by_tokens(summaries, budget, model):
+    batches, current, size = [], [], 0
+    for summary in summaries:
+        tokens = count_tokens(summary, model) + 2  # separator
+        if current and size + tokens > budget:
+            batches.append(current)
+            current, size = [], 0
+        current.append(summary)
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def reduce_summaries(summaries, model="gpt-4", max_workers=None, use_cache=True):
+    """Merge summaries in parallel, level by level, until they fit the final prompt for model.
+
+    Yields ("reduce_level", level, inputs, outputs) after each level and finally
+    ("reduced", summaries).
+    """
+    budget = REDUCE_INPUT_BUDGETS.get(model, 5000)
+    max_workers = max_workers or SUMMARY_WORKERS
+    summaries = list(summaries)
+    level = 0
+    while sum(count_tokens(s, model) + 2 for s in summaries) > budget and level < MAX_REDUCE_LEVELS:
+        level += 1
+        batches = _batch_by_tokens(summaries, budget, model)
+        logger.info(f"Reduce level {level}: merging {len(summaries)} summaries into {len(batches)}")
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [metrics.submit(executor, merge_summaries, batch, "gpt-4o-mini", 2000, use_cache) for batch in batches]
+            summaries = [future.result() for future in futures]
+        yield "reduce_level", level, sum(len(b) for b in batches), len(summaries)
+    yield "reduced", summaries
+
+def _takeaways_request(summaries, report_type, model, use_cache):
+    prompt = takeaways_prompt(report_type)
+
+    # No-op when the caller already reduced the summaries to fit
+    for event in reduce_summaries(summaries, model=model, use_cache=use_cache):
+        if event[0] == "reduced":
+            summaries = event[1]
+    combined_summaries = "\n\n".join(summaries)
+    return prompt, f"Please create the content based on these summaries:\n\n{combined_summaries}"
+
+def extract_key_takeaways(summaries, report_type="analyst", model="gpt-4", max_tokens=2500, use_cache=True):
+    """Second round summarization: Extract key takeaways from the summaries in the specified format."""
+    prompt, user_content = _takeaways_request(summaries, report_type, model, use_cache)
+
+    with metrics.timed("extract_key_takeaways"):
+        content = _chat_completion(
+            "extract_key_takeaways", model, prompt, user_content,
+            max_tokens=max_tokens,
+            temperature=0.4,  # Slightly increased for more creativity in the Medium post
+            use_cache=use_cache
+        )
+    return content
+
+def stream_key_takeaways(summaries, report_type="analyst", model="gpt-4", max_tokens=2500, use_cache=True):
+    """extract_key_takeaways, yielding the text as it is generated. Shares its cache entries."""
+    prompt, user_content = _takeaways_request(summaries, report_type, model, use_cache)
+    yield from _chat_completion_stream(
+        "extract_key_takeaways", model, prompt, user_content,
+        max_tokens=max_tokens,
+        temperature=0.4,
+        use_cache=use_cache
+    )
+
+def generate_title_subtitle(summary, report_type="analyst", model="gpt-4", max_tokens=100, use_cache=True):
+    """Generate a title and subtitle based on the final summary and report type."""
+    prompt = title_prompt(report_type)
+
+    try:
+        with metrics.timed("generate_title_subtitle"):
+            return _chat_completion(
+                "generate_title_subtitle", model, prompt, summary,
+                max_tokens=max_tokens,
+                temperature=0.7,
+                use_cache=use_cache,
+                parse=parse_title
+            )
     except Exception as e:
         print(f"Error in generate_title_subtitle: {e}")
         print(traceback.format_exc())
     
-    return {"title": "Comprehensive Analysis Report", "subtitle": "Detailed summary and key insights from your transcript"}
+    return dict(DEFAULT_TITLE)
 
 def main(transcript, report_type):
     logger.info("Starting main function")
@@ -149,11 +416,10 @@ def main(transcript, report_type):
     logger.info(f"Split transcript into {len(chunks)} chunks")
     
     # Step 2: First round summarization for each chunk
-    chunk_summaries = []
-    for i, chunk in enumerate(chunks):
-        logger.info(f"Summarizing chunk {i+1}/{len(chunks)}")
-        summary = summarize_chunk(chunk)
-        chunk_summaries.append(summary)
+    chunk_summaries = [None] * len(chunks)
+    for done, (i, summary) in enumerate(summarize_chunks(chunks), start=1):
+        logger.info(f"Summarized chunk {i+1} ({done}/{len(chunks)} done)")
+        chunk_summaries[i] = summary
     
     # Step 3: Second round summarization to extract key takeaways
     logger.info("Extracting key takeaways")
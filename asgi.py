@@ -0,0 +1,144 @@
+"""Async serving mode.
+
+Long-lived streams (POST / with mode=stream, /jobs/<id>/events) are handled
+by asyncio handlers, so a single process can hold hundreds of open SSE
+connections while they wait on OpenAI and Supabase. Every other route is
+served by the existing Flask app mounted underneath.
+
+    uvicorn asgi:app --workers 2
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+"""
+import asyncio
+import threading
+import logging
+from starlette.applications import Starlette
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+import app as flask_module
+import async_pipeline
+from jobs import EVENT_POLL_INTERVAL
+import metrics
+
+logger = logging.getLogger(__name__)
+
+def _event_stream(events, event_ids=False):
+    async def generate():
+        try:
+            async for item in events:
+                if event_ids:
+                    seq, event = item
+                    yield flask_module.sse(event, seq)
+                else:
+                    yield flask_module.sse(item)
+        except Exception as e:
+            logger.exception("Error in async stream")
+            yield flask_module.sse({"status": "Error", "message": str(e)})
+    return StreamingResponse(generate(), media_type='text/event-stream')
+
+_DONE = object()
+
+async def iterate_in_thread(iterable):
+    """Step through a blocking generator on one dedicated thread and yield its items.
+
+    Unlike starlette's iterate_in_threadpool, every next() runs in the same thread
+    and context, so context variables the generator sets (metrics.current_run)
+    stay visible and can be reset when it finishes.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # Event loop closed; nobody is listening any more
+            stopped.set()
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                put(item)
+        except Exception as e:
+            put(_DONE, e)
+            return
+        finally:
+            # Runs the generator's cleanup (temp dirs, context resets) on this thread
+            if hasattr(iterator, "close"):
+                iterator.close()
+        put(_DONE)
+
+    metrics.start_thread(produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+def save_row(row):
+    # Queued on the storage layer's background writer; the event loop only waits on the future
+    return asyncio.wrap_future(flask_module.storage.insert_later(row))
+
+async def submit(request):
+    form = await request.form()
+    input_type = form.get('input_type')
+    report_type = form.get('report_type')
+    stream = form.get('mode') == 'stream'
+    if input_type == 'text':
+        transcript = form.get('transcript')
+        if stream:
+            return _event_stream(async_pipeline.analysis_events(
+                transcript, report_type, flask_module.summary_row, save_row, on_saved=flask_module.analysis_saved,
+                delta_interval=flask_module.SUMMARY_DELTA_INTERVAL
+            ))
+        payload = {"transcript": transcript, "report_type": report_type}
+    elif input_type == 'youtube':
+        youtube_link = form.get('youtube_link')
+        if stream:
+            # Download and transcription are blocking (yt-dlp, ffmpeg); run them on their own thread
+            return _event_stream(iterate_in_thread(flask_module.youtube_analysis_events(youtube_link, report_type)))
+        payload = {"youtube_link": youtube_link, "report_type": report_type}
+    else:
+        return JSONResponse({"error": "Invalid input type"}, status_code=400)
+    job_id = await asyncio.to_thread(flask_module.job_runner.submit, input_type, payload)
+    return JSONResponse({"job_id": job_id, "events_url": f"/jobs/{job_id}/events"}, status_code=202)
+
+async def job_events(request):
+    job_id = request.path_params['job_id']
+    # Recovers jobs a crashed worker left behind, like the Flask app's before_request hook
+    flask_module.job_runner.start()
+    if await asyncio.to_thread(flask_module.job_store.get, job_id) is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    last_event_id = request.headers.get('last-event-id') or request.query_params.get('last_event_id') or 0
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        last_event_id = 0
+
+    async def tail():
+        seq = last_event_id
+        while True:
+            events = await asyncio.to_thread(flask_module.job_store.events_after, job_id, seq)
+            for seq, event in events:
+                yield seq, event
+                if event.get("type") == "done":
+                    return
+            if not events:
+                await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return _event_stream(tail(), event_ids=True)
+
+app = Starlette(routes=[
+    Route('/', submit, methods=['POST']),
+    Route('/jobs/{job_id}/events', job_events, methods=['GET']),
+    Mount('/', app=WSGIMiddleware(flask_module.app)),
+])
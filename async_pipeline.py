@@ -0,0 +1,306 @@
+"""asyncio versions of the QA_analyst pipeline for the ASGI server (asgi.py).
+
+Prompts, chunking, caching and metrics are shared with QA_analyst; only the
+I/O differs, so one event loop can drive many analyses while they wait on
+OpenAI and the database.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from dotenv import load_dotenv
+import metrics
+from rate_limiter import rate_limiter, PRIORITY_FINAL, PRIORITY_CHUNK
+from llm_cache import cache
+from text_chunker import iter_chunks, count_tokens
+from QA_analyst import (
+    SUMMARIZE_PROMPT, MERGE_PROMPT, REDUCE_INPUT_BUDGETS, MAX_REDUCE_LEVELS, SUMMARY_WORKERS, DEFAULT_TITLE,
+    takeaways_prompt, title_prompt, parse_title, _batch_by_tokens, completion_key, cached_completion,
+)
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+async def _count_retryable_response(response):
+    metrics.count_retryable_response(response)
+
+# Created on first use, like QA_analyst.get_client, so importing this module doesn't load the openai package
+async_client = None
+_async_client_lock = threading.Lock()
+
+def get_async_client():
+    global async_client
+    if async_client is None:
+        # Threads running their own event loop can ask at once; only one builds the client
+        with _async_client_lock:
+            if async_client is None:
+                async_client = _build_async_client()
+    return async_client
+
+def _build_async_client():
+    import httpx
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        max_retries=0,
+        http_client=httpx.AsyncClient(event_hooks={'response': [_count_retryable_response]})
+    )
+
+def _prompt_tokens(system_prompt, user_content, model):
+    return count_tokens(system_prompt, model) + count_tokens(user_content, model)
+
+def _summaries_tokens(summaries, model):
+    return sum(count_tokens(s, model) + 2 for s in summaries)
+
+async def _chat_completion(function_name, model, system_prompt, user_content, max_tokens, temperature, use_cache=True,
+                           priority=PRIORITY_FINAL, parse=None):
+    key = completion_key(function_name, model, system_prompt, user_content, max_tokens, temperature)
+    if use_cache:
+        # The cache is SQLite and the tokenizer is CPU-bound; neither should block the event loop
+        cached = await asyncio.to_thread(cached_completion, key, function_name, parse)
+        if cached is not None:
+            return cached
+
+    estimated_tokens = await asyncio.to_thread(_prompt_tokens, system_prompt, user_content, model) + max_tokens
+    try:
+        response = await rate_limiter.call_async(model, estimated_tokens, priority, lambda: get_async_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature
+        ))
+    except Exception:
+        metrics.openai_requests.inc(model=model, operation=function_name, outcome="error")
+        raise
+    metrics.openai_requests.inc(model=model, operation=function_name, outcome="ok")
+    metrics.record_usage(model, response.usage)
+    content = response.choices[0].message.content.strip()
+    result = parse(content) if parse else content
+    if use_cache:
+        await asyncio.to_thread(cache.set, key, content)
+    return result
+
+async def _chat_completion_stream(function_name, model, system_prompt, user_content, max_tokens, temperature, use_cache=True,
+                                  priority=PRIORITY_FINAL):
+    """Async counterpart of QA_analyst._chat_completion_stream."""
+    key = completion_key(function_name, model, system_prompt, user_content, max_tokens, temperature)
+    if use_cache:
+        cached = await asyncio.to_thread(cached_completion, key, function_name)
+        if cached is not None:
+            yield cached
+            return
+
+    prompt_tokens = await asyncio.to_thread(_prompt_tokens, system_prompt, user_content, model)
+    parts = []
+    try:
+        stream = await rate_limiter.call_async(model, prompt_tokens + max_tokens, priority, lambda: get_async_client().chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        ))
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception:
+        metrics.openai_requests.inc(model=model, operation=function_name, outcome="error")
+        raise
+    metrics.openai_requests.inc(model=model, operation=function_name, outcome="ok")
+    content = "".join(parts).strip()
+    metrics.record_tokens(model, prompt_tokens, await asyncio.to_thread(count_tokens, content, model))
+    if use_cache:
+        await asyncio.to_thread(cache.set, key, content)
+
+async def summarize_chunk(text, model="gpt-4o-mini", max_tokens=2000, use_cache=True):
+    with metrics.timed("summarize_chunk"):
+        return await _chat_completion(
+            "summarize_chunk", model, SUMMARIZE_PROMPT,
+            f"Please summarize the following text:\n\n{text}",
+            max_tokens=max_tokens,
+            temperature=0.3,
+            use_cache=use_cache,
+            priority=PRIORITY_CHUNK
+        )
+
+async def summarize_chunks(chunks, max_concurrency=None):
+    """Summarize chunks with at most max_concurrency calls in flight, yielding (index, summary) as they finish."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or SUMMARY_WORKERS))
+
+    async def run(index, chunk):
+        async with semaphore:
+            return index, await summarize_chunk(chunk)
+
+    tasks = [asyncio.ensure_future(run(i, chunk)) for i, chunk in enumerate(chunks)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def merge_summaries(summaries, model="gpt-4o-mini", max_tokens=2000, use_cache=True):
+    with metrics.timed("merge_summaries"):
+        return await _chat_completion(
+            "merge_summaries", model, MERGE_PROMPT,
+            "Please merge the following summaries:\n\n" + "\n\n".join(summaries),
+            max_tokens=max_tokens,
+            temperature=0.3,
+            use_cache=use_cache
+        )
+
+async def reduce_summaries(summaries, model="gpt-4", max_concurrency=None, use_cache=True):
+    """Async counterpart of QA_analyst.reduce_summaries, yielding the same events."""
+    budget = REDUCE_INPUT_BUDGETS.get(model, 5000)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or SUMMARY_WORKERS))
+
+    async def merge(batch):
+        async with semaphore:
+            return await merge_summaries(batch, use_cache=use_cache)
+
+    summaries = list(summaries)
+    level = 0
+    while await asyncio.to_thread(_summaries_tokens, summaries, model) > budget and level < MAX_REDUCE_LEVELS:
+        level += 1
+        batches = await asyncio.to_thread(_batch_by_tokens, summaries, budget, model)
+        summaries = list(await asyncio.gather(*(merge(batch) for batch in batches)))
+        yield "reduce_level", level, sum(len(b) for b in batches), len(summaries)
+    yield "reduced", summaries
+
+async def _takeaways_request(summaries, report_type, model, use_cache):
+    prompt = takeaways_prompt(report_type)
+    async for event in reduce_summaries(summaries, model=model, use_cache=use_cache):
+        if event[0] == "reduced":
+            summaries = event[1]
+    return prompt, "Please create the content based on these summaries:\n\n" + "\n\n".join(summaries)
+
+async def extract_key_takeaways(summaries, report_type="analyst", model="gpt-4", max_tokens=2500, use_cache=True):
+    prompt, user_content = await _takeaways_request(summaries, report_type, model, use_cache)
+    with metrics.timed("extract_key_takeaways"):
+        return await _chat_completion(
+            "extract_key_takeaways", model, prompt, user_content,
+            max_tokens=max_tokens,
+            temperature=0.4,
+            use_cache=use_cache
+        )
+
+async def stream_key_takeaways(summaries, report_type="analyst", model="gpt-4", max_tokens=2500, use_cache=True):
+    prompt, user_content = await _takeaways_request(summaries, report_type, model, use_cache)
+    async for delta in _chat_completion_stream(
+        "extract_key_takeaways", model, prompt, user_content,
+        max_tokens=max_tokens,
+        temperature=0.4,
+        use_cache=use_cache
+    ):
+        yield delta
+
+async def generate_title_subtitle(summary, report_type="analyst", model="gpt-4", max_tokens=100, use_cache=True):
+    prompt = title_prompt(report_type)
+    try:
+        with metrics.timed("generate_title_subtitle"):
+            return await _chat_completion(
+                "generate_title_subtitle", model, prompt, summary,
+                max_tokens=max_tokens,
+                temperature=0.7,
+                use_cache=use_cache,
+                parse=parse_title
+            )
+    except Exception as e:
+        logger.error(f"Error in generate_title_subtitle: {e}")
+    return dict(DEFAULT_TITLE)
+
+async def timed_aiter(stage, iterable):
+    """Async counterpart of app.timed_iter: time only the awaits for the next item, not the consumer."""
+    iterator = iterable.__aiter__()
+    elapsed = 0.0
+    while True:
+        start = time.perf_counter()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - start
+        yield item
+    metrics.observe(stage, elapsed)
+
+async def analysis_events(transcript, report_type, build_row, save_row, on_saved=None, delta_interval=0.1):
+    """Async counterpart of app.analysis_events for a complete transcript.
+
+    build_row(transcript, chunk_summaries, final_summary, title_subtitle, report_type)
+    returns the row to insert, and awaiting save_row(row) stores it and returns its ID;
+    on_saved(analysis_id, row, chunk_summaries, transcript) is called after a successful insert.
+    Final-summary deltas are batched into events at most every delta_interval seconds.
+    """
+    run = metrics.RunTimings()
+    # Each streaming response is consumed by its own task, so this doesn't leak into other requests
+    metrics.current_run.set(run)
+    yield {"status": "Processing transcript"}
+    # Tokenizing a long transcript is CPU work; keep it off the event loop
+    chunks = await asyncio.to_thread(lambda: list(iter_chunks(transcript)))
+    chunk_summaries = [None] * len(chunks)
+    done = 0
+    async for i, summary in summarize_chunks(chunks):
+        chunk_summaries[i] = summary
+        done += 1
+        yield {"status": f"Processed chunk {done}/{len(chunks)}", "summary": summary, "index": i, "type": "chunk"}
+
+    reduced_summaries = chunk_summaries
+    async for event in timed_aiter("reduce", reduce_summaries(chunk_summaries)):
+        if event[0] == "reduce_level":
+            _, level, inputs, outputs = event
+            yield {"status": f"Condensed {inputs} summaries into {outputs} (level {level})", "type": "reduce"}
+        else:
+            reduced_summaries = event[1]
+
+    yield {"status": "Extracting key takeaways"}
+    parts, pending, last_flush = [], [], 0.0
+    async for delta in timed_aiter("extract_key_takeaways", stream_key_takeaways(reduced_summaries, report_type)):
+        parts.append(delta)
+        pending.append(delta)
+        if time.monotonic() - last_flush >= delta_interval:
+            yield {"type": "summary_delta", "delta": "".join(pending)}
+            pending, last_flush = [], time.monotonic()
+    if pending:
+        yield {"type": "summary_delta", "delta": "".join(pending)}
+    final_summary = "".join(parts).strip()
+
+    title_task = asyncio.ensure_future(generate_title_subtitle(final_summary, report_type))
+    try:
+        yield {"status": "Generating title", "type": "summary_complete", "final_summary": final_summary}
+        title_subtitle = await title_task
+    finally:
+        title_task.cancel()
+
+    yield {
+        "status": "Complete",
+        "final_summary": final_summary,
+        "chunk_summaries": chunk_summaries,
+        "report_title": title_subtitle.get("title", DEFAULT_TITLE["title"]),
+        "report_subtitle": title_subtitle.get("subtitle", DEFAULT_TITLE["subtitle"]),
+        "transcript": transcript,
+        "type": "final",
+        "timings": run.summary(),
+    }
+
+    try:
+        # Building the row compresses the transcript, and on_saved writes the search index and caches
+        row = await asyncio.to_thread(build_row, transcript, chunk_summaries, final_summary, title_subtitle, report_type)
+        with metrics.timed("db_insert"):
+            analysis_id = await save_row(row)
+        if on_saved is not None:
+            await asyncio.to_thread(on_saved, analysis_id, row, chunk_summaries, transcript)
+        yield {"status": "Data saved to database", "analysis_id": analysis_id, "timings": run.summary()}
+    except Exception as e:
+        logger.error(f"Error inserting data: {str(e)}")
+        yield {"status": "Error saving data", "error": str(e)}
@@ -0,0 +1,167 @@
+"""Local stand-in for the OpenAI API used by the benchmarks.
+
+Serves /v1/chat/completions (plain and streamed) with configurable latency,
+jitter and 429 rate, and counts the calls it receives.
+
+    python benchmarks/fake_openai_server.py --port 8765 --latency 0.5 --jitter 0.2 --rate-limit 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "bitcoin ethereum liquidity staking validator rollup throughput fees adoption "
+    "treasury protocol governance token supply demand market yield volatility"
+).split()
+
+class FakeOpenAIServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.0, rate_limit=0.0, seed=0, token_latency=0.0):
+        self.latency = latency
+        # Extra delay per word when a chat completion is streamed
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.calls = {}
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"calls": dict(self.calls), "total_calls": sum(self.calls.values()), "rate_limited": self.rate_limited}
+
+    def _delay(self):
+        with self._lock:
+            delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+            limited = self.random.random() < self.rate_limit
+        time.sleep(max(0.0, delay))
+        return limited
+
+    def _count(self, key):
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _text(self, n_words):
+        with self._lock:
+            return " ".join(self.random.choice(WORDS) for _ in range(n_words))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _rate_limited(self):
+                with server._lock:
+                    server.rate_limited += 1
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"Retry-After": "1"})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.endswith("/chat/completions"):
+                    self._chat(json.loads(body or b"{}"))
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+
+            def _chat(self, request):
+                server._count("chat:" + request.get("model", "unknown"))
+                if server._delay():
+                    return self._rate_limited()
+                messages = request.get("messages", [])
+                system = messages[0]["content"] if messages else ""
+                if "JSON" in system:
+                    content = json.dumps({"title": "Benchmark Report", "subtitle": "Synthetic subtitle"})
+                else:
+                    n_words = min(request.get("max_tokens") or 300, 300)
+                    content = "\n".join(f"- {server._text(12)}" for _ in range(max(1, n_words // 12)))
+                if request.get("stream"):
+                    return self._chat_stream(request, content)
+                prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
+                completion_tokens = len(content.split())
+                self._send_json(200, {
+                    "id": "chatcmpl-" + uuid.uuid4().hex,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+
+            def _chat_stream(self, request, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                completion_id = "chatcmpl-" + uuid.uuid4().hex
+                for i, word in enumerate(content.split(" ")):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": request.get("model"),
+                        "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    if server.token_latency:
+                        time.sleep(server.token_latency)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random jitter")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per streamed word")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.jitter, args.rate_limit,
+                              token_latency=args.token_latency)
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cold-start benchmark: how long `import app` takes and how much memory it uses.
+
+Each sample imports the module in a fresh interpreter. Pass --ref to also
+measure another git revision (exported to a temporary directory) and print
+the difference.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --ref HEAD~1 --runs 10
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints one JSON line
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+heavy = sorted(m for m in ("torch", "whisper", "yt_dlp", "supabase", "sqlalchemy", "flask_sqlalchemy") if m in sys.modules)
+print(json.dumps({{"seconds": elapsed, "peak_rss_mb": peak_mb, "modules": len(sys.modules), "heavy_modules": heavy}}))
+"""
+
+def _environment(workdir):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.benchmark")
+    env["JOB_STORE_PATH"] = os.path.join(workdir, "jobs.db")
+    env["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+    env["TRANSCRIPT_STORE_PATH"] = os.path.join(workdir, "transcripts.db")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+def measure(source_dir, module, runs):
+    """Import module from source_dir in `runs` fresh interpreters and summarize the samples."""
+    workdir = tempfile.mkdtemp(prefix="import-bench-")
+    env = _environment(workdir)
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", PROBE.format(module=module)],
+                              capture_output=True, text=True, cwd=source_dir, env=env)
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed in {source_dir}:\n{proc.stderr.strip()}")
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    seconds = [s["seconds"] for s in samples]
+    return {
+        "source": source_dir,
+        "runs": runs,
+        "median_seconds": round(statistics.median(seconds), 4),
+        "min_seconds": round(min(seconds), 4),
+        "peak_rss_mb": round(statistics.median(s["peak_rss_mb"] for s in samples), 1),
+        "modules": samples[-1]["modules"],
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+def export_ref(ref):
+    """Write the tree at `ref` into a temporary directory and return its path."""
+    target = tempfile.mkdtemp(prefix="import-bench-ref-")
+    archive = subprocess.run(["git", "archive", ref], capture_output=True, cwd=ROOT, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+    return target
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time and memory of the app")
+    parser.add_argument("--module", default="app", help="module to import (default app)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", help="git revision to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    results = {"current": measure(ROOT, args.module, args.runs)}
+    if args.ref:
+        results[args.ref] = measure(export_ref(args.ref), args.module, args.runs)
+    print(json.dumps(results, indent=2))
+
+    if args.ref:
+        before, after = results[args.ref], results["current"]
+        print(f"import {args.module}: {before['median_seconds']:.3f}s -> {after['median_seconds']:.3f}s, "
+              f"{before['peak_rss_mb']:.0f} MB -> {after['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
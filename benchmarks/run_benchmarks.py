@@ -0,0 +1,239 @@
+"""Offline benchmarks for the summarization pipeline.
+
+Runs each case in its own subprocess against a local fake OpenAI server (see
+fake_openai_server.py) and writes wall time, time-to-first-event, API calls,
+peak RSS and throughput to a JSON file.
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 --latency 0.3 --jitter 0.1
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CASES = ["split_text", "summarize_fanout", "extract_key_takeaways", "format_summary", "sse_process_transcript"]
+DEFAULT_SIZES = [1000, 10000, 100000, 500000]
+VOCABULARY = (
+    "the a of and to in is that for on with as market bitcoin ethereum price liquidity "
+    "protocol validators staking rollups fees adoption institutional regulation supply "
+    "demand treasury yield volatility growth percent billion million quarter year"
+).split()
+
+def synthetic_transcript(n_words, seed=0):
+    """Build a transcript of roughly n_words words with sentences and paragraphs."""
+    rng = random.Random(seed)
+    paragraphs, words = [], 0
+    while words < n_words:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            length = rng.randint(6, 24)
+            sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+            sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+            words += length
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def _setup_environment(workdir):
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.benchmark")
+    os.environ["LLM_CACHE_DISABLED"] = "1"
+    os.environ["TRANSCRIPT_STORE_DISABLED"] = "1"
+    os.environ["JOB_STORE_PATH"] = os.path.join(workdir, "jobs.db")
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["STORAGE_PATH"] = os.path.join(workdir, "analyses.db")
+
+def _point_clients_at(base_url):
+    """Send chat completions to the fake server; the cases never transcribe audio."""
+    from openai import OpenAI
+    import QA_analyst
+    QA_analyst.client = OpenAI(base_url=base_url, api_key="benchmark", max_retries=0)
+
+def run_case(case, n_words, args):
+    """Run one benchmark case in this process and return its metrics."""
+    from fake_openai_server import FakeOpenAIServer
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    _setup_environment(workdir)
+    server = FakeOpenAIServer(latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+                              token_latency=args.token_latency).start()
+    _point_clients_at(args.base_url or server.base_url)
+    import QA_analyst
+
+    transcript = synthetic_transcript(n_words, seed=args.seed)
+    metrics = {"case": case, "words": n_words}
+    start = time.perf_counter()
+    first_event = None
+
+    if case == "split_text":
+        chunks = QA_analyst.split_text(transcript)
+        metrics["chunks"] = len(chunks)
+    elif case == "summarize_fanout":
+        summaries = 0
+        for event in QA_analyst.summarize_stream([transcript]):
+            if event[0] == "summary":
+                summaries += 1
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+        metrics["chunks"] = summaries
+    elif case == "extract_key_takeaways":
+        chunks = QA_analyst.split_text(transcript)
+        # Pre-build chunk summaries locally so only the reduce step is timed
+        summaries = [server._text(250) for _ in chunks]
+        start = time.perf_counter()
+        QA_analyst.extract_key_takeaways(summaries, "analyst")
+        metrics["chunks"] = len(summaries)
+    elif case == "format_summary":
+        import app
+        summary = "\n".join(
+            f"**Heading {i}**\n- {server._text(20)}\n- {server._text(20)}\n{server._text(40)}\n"
+            for i in range(max(1, n_words // 100))
+        )
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            app.render_summary_html(summary)
+        metrics["repeat"] = args.repeat
+        metrics["memoized_seconds"] = _time(lambda: [app.format_summary(summary) for _ in range(args.repeat)])
+    elif case == "sse_process_transcript":
+        import app
+        client = app.app.test_client()
+        response = client.post("/", data={"input_type": "text", "report_type": "analyst",
+                                          "transcript": transcript, "mode": "stream"}, buffered=False)
+        first_chunk = first_summary_token = final = None
+        events = 0
+        for data in response.response:
+            for line in (data.decode() if isinstance(data, bytes) else data).split("\n\n"):
+                if not line.startswith("data: "):
+                    continue
+                events += 1
+                now = time.perf_counter() - start
+                if first_event is None:
+                    first_event = now
+                event = json.loads(line[6:])
+                if event.get("status") == "Error":
+                    raise RuntimeError(f"Analysis failed: {event.get('message')}")
+                event_type = event.get("type")
+                if first_chunk is None and event_type == "chunk":
+                    first_chunk = now
+                if first_summary_token is None and event_type == "summary_delta":
+                    first_summary_token = now
+                if final is None and event_type == "final":
+                    final = now
+        if final is None:
+            raise RuntimeError("Stream ended without a final event")
+        metrics["events"] = events
+        metrics["time_to_first_chunk_seconds"] = round(first_chunk, 4) if first_chunk is not None else None
+        # How long the final summary took to start showing versus to be complete
+        metrics["time_to_first_summary_token_seconds"] = round(first_summary_token, 4) if first_summary_token is not None else None
+        metrics["time_to_final_seconds"] = round(final, 4) if final is not None else None
+    else:
+        raise ValueError(f"Unknown case: {case}")
+
+    wall = time.perf_counter() - start
+    stats = server.stats()
+    server.stop()
+    metrics.update({
+        "wall_seconds": round(wall, 4),
+        "time_to_first_event_seconds": round(first_event, 4) if first_event is not None else None,
+        "api_calls": stats["total_calls"],
+        "api_calls_by_model": stats["calls"],
+        "rate_limited": stats["rate_limited"],
+        "peak_rss_mb": peak_rss_mb(),
+        "words_per_second": round(n_words / wall, 1) if wall > 0 else None,
+    })
+    return metrics
+
+def _time(fn):
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 4)
+
+def run_all(args):
+    results = []
+    for case in args.cases:
+        for n_words in args.sizes:
+            command = [sys.executable, os.path.abspath(__file__), "--case", case, "--words", str(n_words),
+                       "--latency", str(args.latency), "--jitter", str(args.jitter),
+                       "--rate-limit", str(args.rate_limit), "--token-latency", str(args.token_latency),
+                       "--seed", str(args.seed), "--repeat", str(args.repeat)]
+            if args.base_url:
+                command += ["--base-url", args.base_url]
+            print(f"Running {case} ({n_words} words)...", file=sys.stderr)
+            proc = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+            if proc.returncode != 0:
+                results.append({"case": case, "words": n_words, "error": proc.stderr.strip().splitlines()[-1:]})
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return results
+
+def compare(current, previous):
+    """Print wall-time changes for cases present in both runs."""
+    before = {(r["case"], r["words"]): r for r in previous["results"] if "wall_seconds" in r}
+    for result in current["results"]:
+        old = before.get((result["case"], result["words"]))
+        if old is None or "wall_seconds" not in result:
+            continue
+        change = (result["wall_seconds"] - old["wall_seconds"]) / old["wall_seconds"] * 100 if old["wall_seconds"] else 0
+        print(f"{result['case']:<24} {result['words']:>7} words  {old['wall_seconds']:>9.3f}s -> "
+              f"{result['wall_seconds']:>9.3f}s  ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the summarization pipeline")
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="transcript sizes in words")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake API seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="fake API seconds per streamed word")
+    parser.add_argument("--base-url", help="use an already running fake server instead of an in-process one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=50, help="renders per format_summary case")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--words", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.words, args)))
+        return
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"latency": args.latency, "jitter": args.jitter, "rate_limit": args.rate_limit,
+                     "token_latency": args.token_latency,
+                     "summary_workers": os.getenv("SUMMARY_WORKERS", "4")},
+        "results": run_all(args),
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+import traceback
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# A running job whose heartbeat is older than this is treated as crashed and resumed
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+# Finished jobs and their event logs are deleted this long after they were created
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+HEARTBEAT_INTERVAL = 30
+EVENT_POLL_INTERVAL = 0.5
+# Progress events that carry an index; a resumed job doesn't log the ones its earlier attempts already did
+INDEXED_EVENT_TYPES = ("chunk", "segment")
+# Left out of the logged final event; clients load them from /get_analysis/<id> once it is saved
+UNLOGGED_FINAL_FIELDS = ("transcript", "chunk_summaries")
+
+class JobStore:
+    """SQLite-backed job queue, progress event log and checkpoints (transcribed segments, chunk summaries).
+
+    Every process running the app shares the same file, so a job started in one
+    gunicorn worker can be streamed or resumed from another.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, created_at REAL NOT NULL, heartbeat REAL);"
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, seq));"
+                "CREATE TABLE IF NOT EXISTS job_checkpoints ("
+                "job_id TEXT NOT NULL, chunk_hash TEXT NOT NULL, summary TEXT NOT NULL, PRIMARY KEY (job_id, chunk_hash));"
+                "CREATE TABLE IF NOT EXISTS job_segments ("
+                "job_id TEXT NOT NULL, span TEXT NOT NULL, text TEXT NOT NULL, PRIMARY KEY (job_id, span));"
+                "CREATE TABLE IF NOT EXISTS job_transcripts (job_id TEXT PRIMARY KEY, transcript TEXT NOT NULL);"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def create(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+            (job_id, kind, json.dumps(payload), time.time())
+        )
+        return job_id
+
+    def get(self, job_id):
+        rows = self._query("SELECT id, kind, payload, status, attempts, error, created_at FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        id, kind, payload, status, attempts, error, created_at = rows[0]
+        return {"id": id, "kind": kind, "payload": json.loads(payload), "status": status,
+                "attempts": attempts, "error": error, "created_at": created_at}
+
+    def claim(self, job_id):
+        """Atomically take ownership of a queued or stale job. Returns True if this caller won."""
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, heartbeat = ? "
+            "WHERE id = ? AND (status = 'queued' OR (status = 'running' AND heartbeat < ?))",
+            (now, job_id, now - JOB_STALE_SECONDS)
+        )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_ids):
+        now = time.time()
+        for job_id in job_ids:
+            self._execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = 'running'", (now, job_id))
+
+    def finish(self, job_id, status, error=None):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("UPDATE jobs SET status = ?, error = ? WHERE id = ?", (status, error, job_id))
+                if status == 'completed':
+                    # Checkpoints only matter for resuming; the summary deltas are repeated in summary_complete
+                    for table in ("job_checkpoints", "job_segments", "job_transcripts"):
+                        conn.execute(f"DELETE FROM {table} WHERE job_id = ?", (job_id,))
+                    conn.execute(
+                        "DELETE FROM job_events WHERE job_id = ? AND json_extract(data, '$.type') = 'summary_delta'",
+                        (job_id,)
+                    )
+
+    def prune(self, max_age=JOB_RETENTION_SECONDS):
+        """Delete finished jobs created more than max_age seconds ago, with everything logged for them."""
+        old_jobs = "SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND created_at < ?"
+        cutoff = time.time() - max_age
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for table in ("job_events", "job_checkpoints", "job_segments", "job_transcripts"):
+                    conn.execute(f"DELETE FROM {table} WHERE job_id IN ({old_jobs})", (cutoff,))
+                return conn.execute(
+                    "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND created_at < ?", (cutoff,)
+                ).rowcount
+
+    def stale_jobs(self):
+        """Running jobs whose worker stopped heartbeating. Queued jobs are already waiting in an executor."""
+        return self._query(
+            "SELECT id, attempts FROM jobs WHERE status = 'running' AND heartbeat < ?",
+            (time.time() - JOB_STALE_SECONDS,)
+        )
+
+    def append_event(self, job_id, payload):
+        with self._lock:
+            conn = self._connect()
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+            conn.execute("INSERT INTO job_events (job_id, seq, data) VALUES (?, ?, ?)", (job_id, seq, json.dumps(payload)))
+            conn.commit()
+        return seq
+
+    def events_after(self, job_id, seq):
+        rows = self._query("SELECT seq, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq))
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def get_checkpoint(self, job_id, chunk_hash):
+        rows = self._query("SELECT summary FROM job_checkpoints WHERE job_id = ? AND chunk_hash = ?", (job_id, chunk_hash))
+        return rows[0][0] if rows else None
+
+    def save_checkpoint(self, job_id, chunk_hash, summary):
+        self._execute(
+            "INSERT OR REPLACE INTO job_checkpoints (job_id, chunk_hash, summary) VALUES (?, ?, ?)",
+            (job_id, chunk_hash, summary)
+        )
+
+    def get_segment(self, job_id, span):
+        rows = self._query("SELECT text FROM job_segments WHERE job_id = ? AND span = ?", (job_id, span))
+        return rows[0][0] if rows else None
+
+    def save_segment(self, job_id, span, text):
+        self._execute("INSERT OR REPLACE INTO job_segments (job_id, span, text) VALUES (?, ?, ?)", (job_id, span, text))
+
+    def get_transcript(self, job_id):
+        rows = self._query("SELECT transcript FROM job_transcripts WHERE job_id = ?", (job_id,))
+        return rows[0][0] if rows else None
+
+    def save_transcript(self, job_id, transcript):
+        self._execute("INSERT OR REPLACE INTO job_transcripts (job_id, transcript) VALUES (?, ?)", (job_id, transcript))
+
+    def logged_indexes(self, job_id):
+        """(type, index) of the indexed progress events already in a job's log."""
+        return {
+            (event["type"], event.get("index")) for _, event in self.events_after(job_id, 0)
+            if event.get("type") in INDEXED_EVENT_TYPES
+        }
+
+class JobCheckpoint:
+    """Work a job has already done, so a resumed attempt can skip it.
+
+    Chunk summaries are keyed by the chunk's content hash: keying on content
+    rather than position keeps checkpoints valid only for chunks that come out
+    identical when the job is re-run. Transcribed audio segments are keyed by
+    their time span, and the finished transcript lets a resumed job skip the
+    download entirely.
+    """
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    @staticmethod
+    def _hash(chunk):
+        return hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+
+    def get(self, chunk):
+        return self.store.get_checkpoint(self.job_id, self._hash(chunk))
+
+    def save(self, chunk, summary):
+        self.store.save_checkpoint(self.job_id, self._hash(chunk), summary)
+
+    def get_segment(self, span):
+        return self.store.get_segment(self.job_id, span)
+
+    def save_segment(self, span, text):
+        self.store.save_segment(self.job_id, span, text)
+
+    def get_transcript(self):
+        return self.store.get_transcript(self.job_id)
+
+    def save_transcript(self, transcript):
+        self.store.save_transcript(self.job_id, transcript)
+
+class JobRunner:
+    """Runs jobs on a background thread pool and records their progress events.
+
+    handlers maps a job kind to a callable (payload, checkpoint) returning an
+    iterator of event dicts.
+    """
+
+    def __init__(self, store, handlers, max_workers=JOB_WORKERS):
+        self.store = store
+        self.handlers = handlers
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._monitor = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the heartbeat/recovery thread (once per process; later calls are no-ops)."""
+        with self._start_lock:
+            if self._monitor is None:
+                self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+                self._monitor.start()
+
+    def submit(self, kind, payload):
+        self.start()
+        job_id = self.store.create(kind, payload)
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        if not self.store.claim(job_id):
+            return
+        with self._active_lock:
+            self._active.add(job_id)
+        job = self.store.get(job_id)
+        try:
+            logged = set()
+            if job["attempts"] > 1:
+                # Checkpointed segments and chunks are replayed by the handler; clients already have them
+                logged = self.store.logged_indexes(job_id)
+                self.store.append_event(job_id, {"status": "Resuming job", "attempt": job["attempts"]})
+            handler = self.handlers[job["kind"]]
+            for event in handler(job["payload"], JobCheckpoint(self.store, job_id)):
+                if (event.get("type"), event.get("index")) in logged:
+                    continue
+                if event.get("type") == "final":
+                    event = {key: value for key, value in event.items() if key not in UNLOGGED_FINAL_FIELDS}
+                self.store.append_event(job_id, event)
+            self.store.finish(job_id, "completed")
+        except Exception as e:
+            logger.error(f"Error in job {job_id}: {str(e)}")
+            logger.error(traceback.format_exc())
+            self.store.append_event(job_id, {"status": "Error", "message": str(e)})
+            self.store.finish(job_id, "failed", str(e))
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+            self.store.append_event(job_id, {"status": self.store.get(job_id)["status"], "type": "done"})
+
+    def _monitor_loop(self):
+        while True:
+            try:
+                with self._active_lock:
+                    active = list(self._active)
+                self.store.heartbeat(active)
+                self.resume_stale()
+                pruned = self.store.prune()
+                if pruned:
+                    logger.info(f"Pruned {pruned} finished jobs")
+            except Exception as e:
+                logger.error(f"Error in job monitor: {str(e)}")
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def resume_stale(self):
+        """Re-queue jobs left behind by a crashed or killed worker; they pick up from their checkpoints."""
+        for job_id, attempts in self.store.stale_jobs():
+            with self._active_lock:
+                if job_id in self._active:
+                    continue
+            if attempts >= JOB_MAX_ATTEMPTS:
+                self.store.append_event(job_id, {"status": "Error", "message": "Job failed after repeated attempts"})
+                self.store.finish(job_id, "failed", "Too many attempts")
+                self.store.append_event(job_id, {"status": "failed", "type": "done"})
+                continue
+            logger.info(f"Resuming job {job_id}")
+            self.executor.submit(self._run, job_id)
+
+    def stream(self, job_id, last_event_id=0):
+        """Yield (seq, event) for events after last_event_id until the job is finished."""
+        while True:
+            events = self.store.events_after(job_id, last_event_id)
+            for seq, event in events:
+                last_event_id = seq
+                yield seq, event
+                if event.get("type") == "done":
+                    return
+            if not events:
+                job = self.store.get(job_id)
+                if job is None:
+                    return
+                time.sleep(EVENT_POLL_INTERVAL)
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """Content-addressed SQLite cache for LLM completions with size- and age-based LRU eviction."""
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, max_age_seconds=30 * 24 * 3600, enabled=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(*parts):
+        """Hash the call parameters into a stable cache key."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def delete(self, key):
+        if not self.enabled:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            conn.commit()
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.max_age_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we're back under the size budget
+        for key, size in conn.execute("SELECT key, size FROM completions ORDER BY last_used ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "enabled": self.enabled}
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM completions")
+            conn.commit()
+
+cache = LLMCache(
+    os.getenv('LLM_CACHE_PATH', 'llm_cache.db'),
+    max_bytes=int(float(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024),
+    max_age_seconds=int(float(os.getenv('LLM_CACHE_MAX_AGE_DAYS', '30')) * 24 * 3600),
+    enabled=os.getenv('LLM_CACHE_DISABLED', '').lower() not in ('1', 'true', 'yes'),
+)
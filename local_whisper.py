@@ -0,0 +1,72 @@
+import os
+import queue
+import threading
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Model size for local transcription: tiny, base, small, medium, large
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+# "cuda", "cpu", or empty to pick cuda when available
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "")
+# How many model replicas (and so concurrent transcriptions) each process may hold
+LOCAL_WHISPER_WORKERS = int(os.getenv("LOCAL_WHISPER_WORKERS", "1"))
+
+class WhisperEngine:
+    """Process-wide pool of loaded Whisper models.
+
+    Models are loaded on first use and kept for the life of the process, up to
+    `size` replicas; callers beyond that wait for a free one.
+    """
+
+    def __init__(self, model_name=WHISPER_MODEL, device=WHISPER_DEVICE, size=LOCAL_WHISPER_WORKERS):
+        self.model_name = model_name
+        self.device = device
+        self.size = max(1, size)
+        self._idle = queue.Queue()
+        self._loaded = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        import torch
+        import whisper
+        device = self.device or ("cuda" if torch.cuda.is_available() else "cpu")
+        with metrics.timed("whisper_model_load"):
+            model = whisper.load_model(self.model_name, device=device)
+        logger.info(f"Loaded local Whisper model '{self.model_name}' on {device}")
+        return model
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._loaded < self.size
+            if grow:
+                self._loaded += 1
+        if not grow:
+            return self._idle.get()
+        try:
+            return self._load()
+        except Exception:
+            with self._lock:
+                self._loaded -= 1
+            raise
+
+    def transcribe(self, audio_file):
+        """Transcribe a whole file on one pooled model.
+
+        model.transcribe seeks window to window by the predicted timestamps and
+        conditions each window on the text before it, so words aren't cut at
+        30-second boundaries.
+        """
+        model = self._acquire()
+        try:
+            result = model.transcribe(audio_file, fp16=model.device.type == "cuda")
+            return result["text"].strip()
+        finally:
+            self._idle.put(model)
+
+engine = WhisperEngine()
@@ -0,0 +1,142 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds (seconds) for stage latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in labels) + "}"
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+stage_seconds = Histogram("insights_stage_seconds", "Time spent in each pipeline stage")
+openai_requests = Counter("insights_openai_requests_total", "OpenAI API calls by model, operation and outcome")
+openai_tokens = Counter("insights_openai_tokens_total", "Tokens reported in response.usage by model and kind")
+openai_retries = Counter("insights_openai_retries_total", "OpenAI responses that triggered a retry (429/5xx)")
+
+_registry = [stage_seconds, openai_requests, openai_tokens, openai_retries]
+
+class RunTimings:
+    """Per-analysis timing breakdown, shared across the worker threads of one run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+
+    def summary(self):
+        with self._lock:
+            stages = {stage: {"count": v["count"], "seconds": round(v["seconds"], 3)} for stage, v in self._stages.items()}
+        return {"total_seconds": round(time.perf_counter() - self.started, 3), "stages": stages}
+
+current_run = contextvars.ContextVar("current_run", default=None)
+
+def submit(executor, fn, *args):
+    """executor.submit that carries the caller's context (e.g. the current run) into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def start_thread(target):
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(target,), daemon=True)
+    thread.start()
+    return thread
+
+@contextmanager
+def timed(stage):
+    """Record how long the block took, both globally and in the current run's breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def observe(stage, seconds):
+    stage_seconds.observe(seconds, stage=stage)
+    run = current_run.get()
+    if run is not None:
+        run.add(stage, seconds)
+
+def record_usage(model, usage):
+    if usage is None:
+        return
+    record_tokens(model, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+
+def record_tokens(model, prompt_tokens, completion_tokens):
+    openai_tokens.inc(prompt_tokens, model=model, kind="prompt")
+    openai_tokens.inc(completion_tokens, model=model, kind="completion")
+
+def count_retryable_response(response):
+    """httpx response hook: every 429/5xx the OpenAI client sees is followed by a retry."""
+    if response.status_code == 429 or response.status_code >= 500:
+        openai_retries.inc(status=response.status_code)
+
+def render(extra_caches=None):
+    """Render all metrics in the Prometheus text exposition format.
+
+    extra_caches maps a cache name to an object with a stats() method returning hits/misses.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    if extra_caches:
+        lines.append("# HELP insights_cache_lookups_total Cache lookups by cache and result")
+        lines.append("# TYPE insights_cache_lookups_total counter")
+        for name, cache in sorted(extra_caches.items()):
+            stats = cache.stats()
+            lines.append(f'insights_cache_lookups_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+            lines.append(f'insights_cache_lookups_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+    return "\n".join(lines) + "\n"
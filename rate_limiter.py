@@ -0,0 +1,239 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+import logging
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: calls that finish a report go ahead of new chunk work
+PRIORITY_FINAL = 0
+PRIORITY_CHUNK = 1
+
+# (requests per minute, tokens per minute); 0 tokens means no token limit.
+# Override with OPENAI_RATE_LIMITS="gpt-4=500:10000,whisper-1=50"
+DEFAULT_RATE_LIMITS = {
+    "gpt-4": (500, 10000),
+    "gpt-4o": (500, 30000),
+    "gpt-4o-mini": (500, 200000),
+    "whisper-1": (50, 0),
+}
+FALLBACK_RATE_LIMIT = (500, 0)
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "6"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# After a 429 the model's refill rate is scaled down, then recovers a little with every success
+MIN_RATE_SCALE = 0.25
+RATE_DECREASE = 0.75
+RATE_RECOVERY = 0.02
+ASYNC_POLL_INTERVAL = 0.05
+
+def parse_rate_limits(value):
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        model, _, spec = item.partition("=")
+        rpm, _, tpm = spec.partition(":")
+        limits[model.strip()] = (int(rpm), int(tpm or 0))
+    return limits
+
+def retry_after_seconds(error):
+    """Delay the server asked for on a 429/503, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+def is_retryable(error):
+    import openai
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+class _ModelState:
+    """Request and token buckets for one model, plus the queue of callers waiting on them."""
+
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.scale = 1.0
+        self.waiters = []
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60 * self.scale)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60 * self.scale)
+
+    def wait_time(self, tokens, now):
+        """Seconds until a call costing `tokens` fits, or 0 if it fits now."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        wait = max(0.0, (1 - self.requests) / (self.rpm / 60 * self.scale))
+        if self.tpm:
+            # A single call larger than the whole bucket only has to wait for a full bucket
+            needed = min(tokens, self.tpm) - self.tokens
+            wait = max(wait, needed / (self.tpm / 60 * self.scale))
+        return wait
+
+class RateLimiter:
+    """Process-wide scheduler for OpenAI calls.
+
+    Each model has token buckets for requests/min and tokens/min. Callers wait
+    in priority order for their estimated cost, 429s pause the model for the
+    server's Retry-After and slow its refill rate, and failed calls are retried
+    with jittered exponential backoff.
+    """
+
+    def __init__(self, limits=None, max_retries=MAX_RETRIES):
+        self.limits = limits or parse_rate_limits(os.getenv("OPENAI_RATE_LIMITS"))
+        self.max_retries = max_retries
+        self._models = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _state(self, model):
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(*self.limits.get(model, FALLBACK_RATE_LIMIT))
+        return state
+
+    def _enqueue(self, model, tokens, priority):
+        with self._cond:
+            waiter = (priority, next(self._sequence), tokens)
+            heapq.heappush(self._state(model).waiters, waiter)
+            return waiter
+
+    def _poll(self, model, waiter):
+        """Take capacity for waiter if it is first in line and it fits; must hold the lock.
+
+        Returns 0 once granted, otherwise how long to wait (None: until another caller is served).
+        """
+        state = self._state(model)
+        if state.waiters[0] is not waiter:
+            return None
+        now = time.monotonic()
+        state.refill(now)
+        wait = state.wait_time(waiter[2], now)
+        if wait > 0:
+            return wait
+        state.requests -= 1
+        state.tokens -= waiter[2]
+        heapq.heappop(state.waiters)
+        self._cond.notify_all()
+        return 0
+
+    def _cancel(self, model, waiter):
+        with self._cond:
+            state = self._state(model)
+            if waiter in state.waiters:
+                state.waiters.remove(waiter)
+                heapq.heapify(state.waiters)
+                self._cond.notify_all()
+
+    def acquire(self, model, tokens=0, priority=PRIORITY_CHUNK):
+        """Block until a call to model costing `tokens` may be sent."""
+        waiter = self._enqueue(model, tokens, priority)
+        try:
+            with metrics.timed("rate_limit_wait"), self._cond:
+                while True:
+                    wait = self._poll(model, waiter)
+                    if wait == 0:
+                        return
+                    self._cond.wait(wait)
+        except BaseException:
+            self._cancel(model, waiter)
+            raise
+
+    async def acquire_async(self, model, tokens=0, priority=PRIORITY_CHUNK):
+        waiter = self._enqueue(model, tokens, priority)
+        try:
+            with metrics.timed("rate_limit_wait"):
+                while True:
+                    with self._cond:
+                        wait = self._poll(model, waiter)
+                    if wait == 0:
+                        return
+                    await asyncio.sleep(min(wait, 1.0) if wait is not None else ASYNC_POLL_INTERVAL)
+        except BaseException:
+            self._cancel(model, waiter)
+            raise
+
+    def record_success(self, model, estimated_tokens, actual_tokens=None):
+        """Settle the token bucket with the real usage and let the rate recover."""
+        with self._cond:
+            state = self._state(model)
+            if actual_tokens is not None:
+                state.tokens += estimated_tokens - actual_tokens
+            state.scale = min(1.0, state.scale + RATE_RECOVERY)
+            self._cond.notify_all()
+
+    def record_failure(self, model, error, attempt):
+        """Back off after a retryable error and return how long this caller should sleep."""
+        retry_after = retry_after_seconds(error)
+        delay = retry_after if retry_after is not None else random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        if getattr(error, "status_code", None) == 429:
+            with self._cond:
+                state = self._state(model)
+                state.paused_until = max(state.paused_until, time.monotonic() + delay)
+                state.scale = max(MIN_RATE_SCALE, state.scale * RATE_DECREASE)
+        logger.warning(f"OpenAI {model} call failed ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        return delay
+
+    def call(self, model, estimated_tokens, priority, fn):
+        """Run fn() under the model's limits, retrying retryable errors. fn's result needs a .usage for token settling."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(model, estimated_tokens, priority)
+            try:
+                result = fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                time.sleep(self.record_failure(model, e, attempt))
+                continue
+            self.record_success(model, estimated_tokens, _total_tokens(result))
+            return result
+
+    async def call_async(self, model, estimated_tokens, priority, fn):
+        """Async counterpart of call; fn returns an awaitable."""
+        for attempt in range(self.max_retries + 1):
+            await self.acquire_async(model, estimated_tokens, priority)
+            try:
+                result = await fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(self.record_failure(model, e, attempt))
+                continue
+            self.record_success(model, estimated_tokens, _total_tokens(result))
+            return result
+
+    def stats(self):
+        with self._cond:
+            return {
+                model: {"waiting": len(state.waiters), "rate_scale": round(state.scale, 3),
+                        "paused_for": round(max(0.0, state.paused_until - time.monotonic()), 3)}
+                for model, state in self._models.items()
+            }
+
+def _total_tokens(result):
+    usage = getattr(result, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,204 @@
+import re
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Cap on the chunk summaries + transcript text indexed per report; Postgres
+# tsvectors are limited to 1MB
+SEARCH_TEXT_MAX_CHARS = 500000
+SNIPPET_START = "<mark>"
+SNIPPET_END = "</mark>"
+
+_QUERY_TERM_RE = re.compile(r'(-?)"([^"]+)"|(-?)(\S+)')
+_WORD_RE = re.compile(r"\w+")
+
+def search_document(chunk_summaries, transcript):
+    """The lower-weighted body text of a report: its chunk summaries, then the transcript."""
+    return ("\n\n".join(chunk_summaries) + "\n\n" + (transcript or ""))[:SEARCH_TEXT_MAX_CHARS]
+
+def fts5_query(query):
+    """Translate a web-search style query (words, "phrases", -exclusions) into FTS5 syntax.
+
+    Terms are quoted so user input can never be parsed as FTS5 operators.
+    Returns None if nothing searchable is left.
+    """
+    include, exclude = [], []
+    for phrase_neg, phrase, word_neg, word in _QUERY_TERM_RE.findall(query or ""):
+        words = _WORD_RE.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        (exclude if (phrase_neg or word_neg) else include).append(term)
+    if not include:
+        return None
+    return " AND ".join(include) + "".join(f" NOT {term}" for term in exclude)
+
+class SQLiteSearchIndex:
+    """Local FTS5 mirror of the summaries table, for development and tests."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # rowid is the analysis ID
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5("
+                "report_title, final_summary, chunk_summaries, transcript, "
+                "created_at UNINDEXED, report_type UNINDEXED, tokenize='porter unicode61')"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def row_fields(self, chunk_summaries, transcript):
+        """Extra columns to store with the summaries row; none, the mirror is written after the insert."""
+        return {}
+
+    def index(self, analysis_id, row, chunk_summaries, transcript):
+        """Add or replace one report in the index."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM analyses_fts WHERE rowid = ?", (analysis_id,))
+            conn.execute(
+                "INSERT INTO analyses_fts (rowid, report_title, final_summary, chunk_summaries, transcript, created_at, report_type) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (analysis_id, row.get("report_title") or "", row.get("final_summary") or "",
+                 "\n\n".join(chunk_summaries), (transcript or "")[:SEARCH_TEXT_MAX_CHARS],
+                 row.get("created_at"), row.get("report_type"))
+            )
+            conn.commit()
+
+    reindex = index
+
+    def search(self, query, limit=20, offset=0):
+        """Ranked matches, best first, each with a highlighted snippet."""
+        match = fts5_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT rowid, created_at, report_title, report_type, "
+                # Column weights: title > final summary > chunk summaries > transcript
+                "bm25(analyses_fts, 10.0, 4.0, 2.0, 1.0) AS score, "
+                f"snippet(analyses_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 24) "
+                "FROM analyses_fts WHERE analyses_fts MATCH ? ORDER BY score LIMIT ? OFFSET ?",
+                (match, limit, offset)
+            ).fetchall()
+        return [
+            {"id": id, "created_at": created_at, "report_title": title, "report_type": report_type,
+             "rank": round(-score, 4), "snippet": snippet}
+            for id, created_at, title, report_type, score, snippet in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            count = self._connect().execute("SELECT COUNT(*) FROM analyses_fts").fetchone()[0]
+        return {"documents": count}
+
+MISSING_SEARCH_SCHEMA = "summaries.search_text does not exist; apply sql/summaries_search.sql"
+
+class PostgresSearch:
+    """Search through the tsvector/GIN index and search_summaries() function in sql/summaries_search.sql.
+
+    The search vector is built by a trigger from a transient search_text column,
+    because transcript and chunk_summaries are stored compressed. The column is
+    checked once, on first use: without it every insert would be rejected, so
+    the fallback index (if any) is used instead, otherwise a RuntimeError is raised.
+    """
+
+    def __init__(self, client_factory, fallback=None):
+        self.client_factory = client_factory
+        self.fallback = fallback
+        self._active = None
+        self._lock = threading.Lock()
+
+    def _has_search_text(self):
+        try:
+            self.client_factory().table("summaries").select("search_text").limit(1).execute()
+        except Exception as e:
+            # PostgREST passes Postgres' undefined_column error through
+            if getattr(e, "code", None) == "42703":
+                return False
+            raise
+        return True
+
+    def _index(self):
+        """This index, or the fallback when the database hasn't been migrated."""
+        if self._active is None:
+            with self._lock:
+                if self._active is None:
+                    if self._has_search_text():
+                        self._active = self
+                    elif self.fallback is None:
+                        raise RuntimeError(MISSING_SEARCH_SCHEMA)
+                    else:
+                        logger.error(f"{MISSING_SEARCH_SCHEMA}; using the local search index instead")
+                        self._active = self.fallback
+        return self._active
+
+    def row_fields(self, chunk_summaries, transcript):
+        index = self._index()
+        if index is not self:
+            return index.row_fields(chunk_summaries, transcript)
+        return {"search_text": search_document(chunk_summaries, transcript)}
+
+    def index(self, analysis_id, row, chunk_summaries, transcript):
+        index = self._index()
+        if index is not self:
+            index.index(analysis_id, row, chunk_summaries, transcript)
+        # Otherwise done by the trigger as part of the insert
+
+    def reindex(self, analysis_id, row, chunk_summaries, transcript):
+        """Rebuild the search vector of an existing row (the trigger also fires on updates of search_text)."""
+        index = self._index()
+        if index is not self:
+            return index.reindex(analysis_id, row, chunk_summaries, transcript)
+        self._update_search_text(analysis_id, search_document(chunk_summaries, transcript))
+
+    def _update_search_text(self, analysis_id, search_text):
+        self.client_factory().table("summaries").update({"search_text": search_text}).eq("id", analysis_id).execute()
+
+    def search(self, query, limit=20, offset=0):
+        index = self._index()
+        if index is not self:
+            return index.search(query, limit, offset)
+        if not (query or "").strip():
+            return []
+        return self._search(query, limit, offset)
+
+    def _search(self, query, limit, offset):
+        response = self.client_factory().rpc(
+            "search_summaries", {"query": query, "match_limit": limit, "match_offset": offset}
+        ).execute()
+        return response.data
+
+class PostgresSQLSearch(PostgresSearch):
+    """PostgresSearch over a pooled SQLAlchemy engine instead of the REST API."""
+
+    def __init__(self, engine, fallback=None):
+        from sqlalchemy import text
+        super().__init__(None, fallback)
+        self.engine = engine
+        self._search_statement = text("SELECT * FROM search_summaries(:query, :match_limit, :match_offset)")
+        self._reindex_statement = text("UPDATE summaries SET search_text = :search_text WHERE id = :id")
+        self._column_statement = text(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'summaries' AND column_name = 'search_text'"
+        )
+
+    def _has_search_text(self):
+        with self.engine.connect() as conn:
+            return conn.execute(self._column_statement).first() is not None
+
+    def _update_search_text(self, analysis_id, search_text):
+        with self.engine.begin() as conn:
+            conn.execute(self._reindex_statement, {"id": analysis_id, "search_text": search_text})
+
+    def _search(self, query, limit, offset):
+        with self.engine.connect() as conn:
+            rows = conn.execute(self._search_statement, {"query": query, "match_limit": limit, "match_offset": offset}).mappings()
+            return [dict(row, created_at=row["created_at"].isoformat()) for row in rows]
@@ -0,0 +1,49 @@
+-- Full-text search over stored analyses (SEARCH_BACKEND=postgres).
+--
+-- transcript and chunk_summaries are stored gzip-compressed, so the app sends
+-- their plain text in search_text on insert. The trigger folds it into
+-- search_vector and clears it, so the plain text is never stored.
+
+alter table summaries add column if not exists search_text text;
+alter table summaries add column if not exists search_vector tsvector;
+
+create index if not exists summaries_search_vector on summaries using gin (search_vector);
+
+create or replace function summaries_search_vector_update() returns trigger
+language plpgsql as $$
+begin
+  new.search_vector :=
+    setweight(to_tsvector('english', coalesce(new.report_title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(new.final_summary, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(new.search_text, '')), 'C');
+  new.search_text := null;
+  return new;
+end
+$$;
+
+drop trigger if exists summaries_search_vector_update on summaries;
+create trigger summaries_search_vector_update
+  before insert or update of search_text on summaries
+  for each row execute function summaries_search_vector_update();
+
+-- Ranked matches with a highlighted snippet of the final summary. Snippets
+-- are only built for the rows on the requested page.
+create or replace function search_summaries(query text, match_limit int default 20, match_offset int default 0)
+returns table (id bigint, created_at timestamptz, report_title text, report_type text, rank real, snippet text)
+language sql stable as $$
+  with q as (
+    select websearch_to_tsquery('english', query) as tsquery
+  ), matches as (
+    select s.id, s.created_at, s.report_title, s.report_type, s.final_summary,
+           ts_rank_cd(s.search_vector, q.tsquery) as rank
+    from summaries s, q
+    where s.search_vector @@ q.tsquery
+    order by rank desc, s.id desc
+    limit match_limit offset match_offset
+  )
+  select m.id::bigint, m.created_at::timestamptz, m.report_title::text, m.report_type::text, m.rank::real,
+         ts_headline('english', coalesce(m.final_summary, ''), q.tsquery,
+                     'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "')
+  from matches m, q
+  order by m.rank desc, m.id desc;
+$$;
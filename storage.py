@@ -0,0 +1,284 @@
+"""Storage backends for the summaries table.
+
+All backends share one interface:
+
+    insert(row) -> id             insert_later(row) -> Future[id]
+    get(id, columns) -> dict      list_page(columns, limit, before=None) -> [dict]
+    iter_rows(columns) -> rows    search(query, limit, offset) -> [dict]
+
+and expose the search index they use as `search_index`. Rows carry
+created_at as an ISO 8601 string on every backend.
+"""
+import queue
+import sqlite3
+import threading
+import logging
+from concurrent.futures import Future
+from search_index import SQLiteSearchIndex
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "id", "created_at", "transcript", "final_summary", "chunk_summaries",
+    "report_title", "report_subtitle", "report_type", "source_analysis_id",
+)
+# Write-only: consumed by the search trigger on Postgres (see sql/summaries_search.sql)
+WRITE_ONLY_COLUMNS = ("search_text",)
+WRITE_BATCH_SIZE = 50
+
+def _column_list(columns):
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown summaries columns: {', '.join(unknown)}")
+    return ", ".join(columns)
+
+class WriteBehind:
+    """Background writer that batches inserts from concurrent requests into one round trip."""
+
+    def __init__(self, insert_many, max_batch=WRITE_BATCH_SIZE):
+        self.insert_many = insert_many
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, row):
+        future = Future()
+        self._queue.put((row, future))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # A bulk insert needs one column set (PostgREST rejects mixed keys), e.g.
+            # regenerated reports carry source_analysis_id and new ones don't
+            groups = {}
+            for row, future in batch:
+                groups.setdefault(tuple(sorted(row)), []).append((row, future))
+            for group in groups.values():
+                self._write(group)
+
+    def _write(self, group):
+        try:
+            ids = self.insert_many([row for row, _ in group])
+        except Exception as e:
+            if len(group) > 1:
+                # Retry one by one so only the rows that actually fail are lost
+                logger.warning(f"Batch insert of {len(group)} summaries failed ({str(e)}); retrying row by row")
+                for item in group:
+                    self._write([item])
+                return
+            logger.error(f"Error writing summary: {str(e)}")
+            group[0][1].set_exception(e)
+            return
+        for (_, future), id in zip(group, ids):
+            future.set_result(id)
+
+class _Storage:
+    def __init__(self, search_index):
+        self.search_index = search_index
+        self._writer = WriteBehind(self.insert_many)
+
+    def insert(self, row):
+        return self.insert_many([row])[0]
+
+    def insert_later(self, row):
+        """Queue the insert on the background writer; the returned Future resolves to the new ID."""
+        return self._writer.submit(row)
+
+    def search(self, query, limit=20, offset=0):
+        return self.search_index.search(query, limit, offset)
+
+class SupabaseStorage(_Storage):
+    """The summaries table through Supabase's REST API."""
+
+    def __init__(self, client_factory, search_index):
+        super().__init__(search_index)
+        self.client_factory = client_factory
+
+    def _table(self):
+        return self.client_factory().table("summaries")
+
+    def insert_many(self, rows):
+        # PostgREST returns the inserted rows in request order
+        return [row['id'] for row in self._table().insert(rows).execute().data]
+
+    def get(self, id, columns):
+        data = self._table().select(_column_list(columns)).eq("id", id).execute().data
+        return data[0] if data else None
+
+    def list_page(self, columns, limit, before=None):
+        query = self._table().select(_column_list(columns))
+        if before:
+            created_at, id = before
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{id})')
+        return query.order('created_at', desc=True).order('id', desc=True).limit(limit).execute().data
+
+    def iter_rows(self, columns, batch_size=100):
+        last_id = 0
+        while True:
+            rows = self._table().select(_column_list(columns)).gt("id", last_id).order("id").limit(batch_size).execute().data
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]['id']
+
+class PostgresStorage(_Storage):
+    """Direct Postgres access through a pooled SQLAlchemy engine.
+
+    Statements are built once per column set (and batch size) and reused, so
+    SQLAlchemy's compiled cache serves every request after the first.
+    """
+
+    def __init__(self, url, pool_size=5, max_overflow=10):
+        from sqlalchemy import create_engine
+        from search_index import PostgresSQLSearch
+        self.engine = create_engine(
+            url, pool_size=pool_size, max_overflow=max_overflow,
+            pool_pre_ping=True, pool_recycle=300, future=True,
+        )
+        super().__init__(PostgresSQLSearch(self.engine))
+        self._statements = {}
+        self._lock = threading.Lock()
+
+    def _statement(self, key, build):
+        with self._lock:
+            statement = self._statements.get(key)
+            if statement is None:
+                from sqlalchemy import text
+                statement = self._statements[key] = text(build())
+        return statement
+
+    @staticmethod
+    def _normalize(row):
+        row = dict(row)
+        if row.get("created_at") is not None and not isinstance(row["created_at"], str):
+            row["created_at"] = row["created_at"].isoformat()
+        return row
+
+    def insert_many(self, rows):
+        """Insert rows with one multi-row INSERT per column set."""
+        ids = [None] * len(rows)
+        groups = {}
+        for i, row in enumerate(rows):
+            groups.setdefault(tuple(c for c in row if c in COLUMNS + WRITE_ONLY_COLUMNS), []).append(i)
+        with self.engine.begin() as conn:
+            for columns, indexes in groups.items():
+                statement = self._statement(("insert", columns, len(indexes)), lambda: (
+                    f"INSERT INTO summaries ({', '.join(columns)}) VALUES "
+                    + ", ".join("(" + ", ".join(f":{c}_{n}" for c in columns) + ")" for n in range(len(indexes)))
+                    + " RETURNING id"
+                ))
+                params = {f"{c}_{n}": rows[i][c] for n, i in enumerate(indexes) for c in columns}
+                # IDs come from the sequence in VALUES order, so sorting them restores the row order
+                for i, id in zip(indexes, sorted(conn.execute(statement, params).scalars())):
+                    ids[i] = id
+        return ids
+
+    def get(self, id, columns):
+        statement = self._statement(("get", tuple(columns)), lambda: (
+            f"SELECT {_column_list(columns)} FROM summaries WHERE id = :id"
+        ))
+        with self.engine.connect() as conn:
+            row = conn.execute(statement, {"id": id}).mappings().first()
+        return self._normalize(row) if row is not None else None
+
+    def list_page(self, columns, limit, before=None):
+        statement = self._statement(("list", tuple(columns), bool(before)), lambda: (
+            f"SELECT {_column_list(columns)} FROM summaries "
+            + ("WHERE (created_at, id) < (CAST(:created_at AS timestamptz), :id) " if before else "")
+            + "ORDER BY created_at DESC, id DESC LIMIT :limit"
+        ))
+        params = {"limit": limit}
+        if before:
+            params["created_at"], params["id"] = before
+        with self.engine.connect() as conn:
+            return [self._normalize(row) for row in conn.execute(statement, params).mappings()]
+
+    def iter_rows(self, columns, batch_size=100):
+        statement = self._statement(("iter", tuple(columns)), lambda: (
+            f"SELECT {_column_list(columns)} FROM summaries WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ))
+        last_id = 0
+        while True:
+            with self.engine.connect() as conn:
+                rows = [self._normalize(row) for row in conn.execute(statement, {"last_id": last_id, "limit": batch_size}).mappings()]
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]['id']
+
+class SQLiteStorage(_Storage):
+    """Single-file storage for tests, offline development and single-node deployments."""
+
+    def __init__(self, path):
+        super().__init__(SQLiteSearchIndex(path))
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT NOT NULL, transcript TEXT, "
+                "final_summary TEXT, chunk_summaries TEXT, report_title TEXT, report_subtitle TEXT, "
+                "report_type TEXT, source_analysis_id INTEGER)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_created_at_id ON summaries (created_at DESC, id DESC)")
+            self._conn.commit()
+        return self._conn
+
+    def insert_many(self, rows):
+        ids = []
+        with self._lock:
+            conn = self._connect()
+            # One transaction: either every row is stored or none is
+            with conn:
+                for row in rows:
+                    columns = [c for c in row if c in COLUMNS]
+                    cursor = conn.execute(
+                        f"INSERT INTO summaries ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                        [row[c] for c in columns]
+                    )
+                    ids.append(cursor.lastrowid)
+        return ids
+
+    def get(self, id, columns):
+        with self._lock:
+            row = self._connect().execute(f"SELECT {_column_list(columns)} FROM summaries WHERE id = ?", (id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list_page(self, columns, limit, before=None):
+        sql = f"SELECT {_column_list(columns)} FROM summaries "
+        params = []
+        if before:
+            sql += "WHERE (created_at, id) < (?, ?) "
+            params += list(before)
+        sql += "ORDER BY created_at DESC, id DESC LIMIT ?"
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(sql, params + [limit])]
+
+    def iter_rows(self, columns, batch_size=100):
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = [dict(row) for row in self._connect().execute(
+                    f"SELECT {_column_list(columns)} FROM summaries WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                )]
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1]['id']
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app reads its configuration at import time; keep every store in a scratch directory
+_workdir = tempfile.mkdtemp(prefix="insights-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["STORAGE_BACKEND"] = "sqlite"
+for name, filename in (("STORAGE_PATH", "analyses.db"), ("JOB_STORE_PATH", "jobs.db"),
+                       ("LLM_CACHE_PATH", "llm_cache.db"), ("TRANSCRIPT_STORE_PATH", "transcripts.db"),
+                       ("SEARCH_INDEX_PATH", "search.db")):
+    os.environ[name] = os.path.join(_workdir, filename)
+
+class WordEncoding:
+    """One token per word, so chunk sizes in tests are easy to count and no tokenizer is downloaded."""
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+@pytest.fixture
+def words(monkeypatch):
+    import text_chunker
+    monkeypatch.setattr(text_chunker, "get_encoding", lambda model: WordEncoding())
@@ -0,0 +1,177 @@
+import base64
+import json
+import time
+import pytest
+import metrics
+import QA_analyst
+import text_chunker
+import app as flask_module
+from text_codec import compress_text, decompress_text
+
+@pytest.fixture
+def client():
+    return flask_module.app.test_client()
+
+def _store(created_at, id=None):
+    row = {"created_at": created_at, "final_summary": "- point", "report_title": "Title",
+           "report_subtitle": "Subtitle", "report_type": "analyst"}
+    if id is not None:
+        row["id"] = id
+    return flask_module.storage.insert(row)
+
+def _delete(id):
+    with flask_module.storage._lock:
+        conn = flask_module.storage._connect()
+        conn.execute("DELETE FROM summaries WHERE id = ?", (id,))
+        conn.commit()
+
+def test_get_analysis_revalidates(client):
+    id = _store("2024-01-01T00:00:00+00:00")
+    first = client.get(f"/get_analysis/{id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get(f"/get_analysis/{id}", headers={"If-None-Match": etag}).status_code == 304
+
+def test_reused_id_does_not_validate_old_etag(client):
+    id = _store("2024-01-01T00:00:00+00:00")
+    etag = client.get(f"/get_analysis/{id}").headers["ETag"]
+    _delete(id)
+    assert client.get(f"/get_analysis/{id}", headers={"If-None-Match": etag}).status_code == 404
+    _store("2024-02-01T00:00:00+00:00", id=id)
+    response = client.get(f"/get_analysis/{id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def _cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+def test_history_pages_with_cursor(client):
+    flask_module.history_cache.clear()
+    for day in (1, 2, 3):
+        _store(f"2023-05-0{day}T00:00:00+00:00")
+    first = client.get("/get_history?limit=1").json
+    second = client.get(f"/get_history?limit=1&cursor={first['next_cursor']}").json
+    assert second["items"][0]["created_at"] < first["items"][0]["created_at"]
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!", _cursor({"created_at": "2024-01-01T00:00:00+00:00"}), _cursor(["2024-01-01T00:00:00+00:00"]),
+    _cursor([1, 2]), _cursor(["2024-01-01T00:00:00+00:00", "7"]), _cursor(["yesterday", 7]),
+    _cursor(['2024-01-01T00:00:00+00:00",id.gt.0', 7]),
+])
+def test_malformed_cursor_is_a_bad_request(client, cursor):
+    assert client.get(f"/get_history?cursor={cursor}").status_code == 400
+
+def _slow_first_chunks(monkeypatch, parts):
+    """Summaries of 'Part <i> ...' chunks that finish in reverse order."""
+    def summarize_chunk(chunk):
+        time.sleep(0.03 * (parts - int(chunk.split()[1])))
+        return f"summary {chunk.split()[1]}"
+    monkeypatch.setattr(QA_analyst, "summarize_chunk", summarize_chunk)
+
+def test_chunk_summaries_keep_transcript_order(words, monkeypatch):
+    monkeypatch.setattr(text_chunker, "DEFAULT_CHUNK_TOKENS", 5)
+    monkeypatch.setattr(text_chunker, "DEFAULT_OVERLAP_TOKENS", 0)
+    _slow_first_chunks(monkeypatch, 4)
+    reported = []
+    monkeypatch.setattr(flask_module, "report_events",
+                        lambda chunk_summaries, report_type, transcript: reported.append(chunk_summaries) or iter(()))
+
+    pieces = [f"Part {i} of the talk." for i in range(4)]
+    events = list(flask_module.analysis_events(pieces, "analyst"))
+    assert [e["index"] for e in events if e.get("type") == "chunk"] == [3, 2, 1, 0]
+    assert reported == [["summary 0", "summary 1", "summary 2", "summary 3"]]
+
+def test_metrics_exposes_stage_timings_tokens_and_caches(client):
+    metrics.observe("test_stage", 0.3)
+    metrics.record_tokens("test-model", 120, 30)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    lines = response.get_data(as_text=True).splitlines()
+    assert 'insights_stage_seconds_bucket{stage="test_stage",le="0.25"} 0' in lines
+    assert 'insights_stage_seconds_bucket{stage="test_stage",le="0.5"} 1' in lines
+    assert 'insights_stage_seconds_count{stage="test_stage"} 1' in lines
+    assert 'insights_openai_tokens_total{kind="prompt",model="test-model"} 120' in lines
+    assert 'insights_openai_tokens_total{kind="completion",model="test-model"} 30' in lines
+    assert any(line.startswith('insights_cache_lookups_total{cache="llm",result="hit"} ') for line in lines)
+
+@pytest.fixture
+def fake_report(monkeypatch):
+    """Replace the LLM steps after chunk summarization; records what the final summary was built from."""
+    calls = {}
+
+    def stream_key_takeaways(summaries, report_type):
+        calls["summaries"], calls["report_type"] = summaries, report_type
+        yield from ["Final ", "summary ", "text"]
+
+    monkeypatch.setattr(flask_module, "reduce_summaries", lambda summaries: iter([("reduced", summaries)]))
+    monkeypatch.setattr(flask_module, "stream_key_takeaways", stream_key_takeaways)
+    monkeypatch.setattr(flask_module, "generate_title_subtitle",
+                        lambda summary, report_type: {"title": "New title", "subtitle": "New subtitle"})
+    return calls
+
+def _sse_events(response):
+    return [json.loads(line[6:]) for line in response.get_data(as_text=True).split("\n\n") if line.startswith("data: ")]
+
+def test_regenerate_restyles_stored_chunk_summaries(client, fake_report):
+    id = flask_module.storage.insert({
+        "created_at": "2024-03-01T00:00:00+00:00", "final_summary": "- point", "report_title": "Title",
+        "report_subtitle": "Subtitle", "report_type": "analyst", "transcript": compress_text("The transcript."),
+        "chunk_summaries": compress_text(json.dumps(["first summary", "second summary"])),
+    })
+    response = client.post(f"/get_analysis/{id}/regenerate", data={"report_type": "medium", "mode": "stream"})
+    events = _sse_events(response)
+
+    assert fake_report == {"summaries": ["first summary", "second summary"], "report_type": "medium"}
+    new_id = events[-1]["analysis_id"]
+    assert new_id != id
+    stored = flask_module.storage.get(new_id, ["report_type", "final_summary", "source_analysis_id", "transcript"])
+    assert stored["report_type"] == "medium"
+    assert stored["final_summary"] == "Final summary text"
+    assert stored["source_analysis_id"] == id
+    assert decompress_text(stored["transcript"]) == "The transcript."
+
+def test_regenerate_rejects_unknown_report_types_and_analyses(client, fake_report):
+    id = _store("2024-03-02T00:00:00+00:00")
+    assert client.post(f"/get_analysis/{id}/regenerate", data={"report_type": "poem"}).status_code == 400
+    assert client.post("/get_analysis/999999/regenerate", data={"report_type": "medium"}).status_code == 404
+
+def test_final_summary_streams_as_deltas_before_the_final_event(fake_report, monkeypatch):
+    monkeypatch.setattr(flask_module, "SUMMARY_DELTA_INTERVAL", 0)
+    events = list(flask_module.report_events(["chunk summary"], "analyst", "The transcript."))
+    types = [event.get("type") for event in events]
+
+    deltas = [event["delta"] for event in events if event.get("type") == "summary_delta"]
+    assert deltas == ["Final ", "summary ", "text"]
+    assert types.index("summary_complete") > types.index("summary_delta")
+    assert types.index("final") > types.index("summary_complete")
+    assert events[types.index("summary_complete")]["final_summary"] == "".join(deltas)
+    assert events[types.index("final")]["report_title"] == "New title"
+
+def test_summary_deltas_are_batched_by_interval(fake_report, monkeypatch):
+    monkeypatch.setattr(flask_module, "SUMMARY_DELTA_INTERVAL", 60)
+    events = list(flask_module.report_events(["chunk summary"], "analyst", "The transcript."))
+    # The first delta goes out at once; the rest wait for the interval or the end of the stream
+    assert [event["delta"] for event in events if event.get("type") == "summary_delta"] == ["Final ", "summary text"]
+
+def _count_gets(monkeypatch):
+    calls = []
+    get = flask_module.storage.get
+    monkeypatch.setattr(flask_module.storage, "get", lambda *args: calls.append(args) or get(*args))
+    return calls
+
+def test_get_analysis_loads_the_row_once_per_request(client, monkeypatch):
+    id = _store("2024-04-01T00:00:00+00:00")
+    calls = _count_gets(monkeypatch)
+    etag = client.get(f"/get_analysis/{id}").headers["ETag"]
+    assert client.get(f"/get_analysis/{id}", headers={"If-None-Match": etag}).status_code == 304
+    assert len(calls) == 2
+
+def test_cached_result_page_needs_no_query(client, monkeypatch):
+    id = _store("2024-04-02T00:00:00+00:00")
+    calls = _count_gets(monkeypatch)
+    first = client.get(f"/result/{id}")
+    assert first.status_code == 200
+    assert client.get(f"/result/{id}").get_data() == first.get_data()
+    assert client.get(f"/result/{id}", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert len(calls) == 1
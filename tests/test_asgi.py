@@ -0,0 +1,39 @@
+import json
+import time
+from starlette.testclient import TestClient
+import app as flask_module
+import asgi
+import metrics
+
+def _events(response):
+    return [json.loads(block[len("data: "):]) for block in response.text.split("\n\n") if block.startswith("data: ")]
+
+def test_youtube_stream_keeps_run_timings(monkeypatch):
+    def fake_pipeline(youtube_link, report_type, checkpoint=None):
+        for stage in ("video_info", "download", "transcription"):
+            with metrics.timed(stage):
+                time.sleep(0.01)
+            yield {"status": stage}
+        yield {"status": "Data saved to database", "analysis_id": 1}
+
+    monkeypatch.setattr(flask_module, "_youtube_analysis_events", fake_pipeline)
+    client = TestClient(asgi.app)
+    response = client.post("/", data={"input_type": "youtube", "youtube_link": "https://youtu.be/x",
+                                      "report_type": "analyst", "mode": "stream"})
+
+    events = _events(response)
+    assert [e["status"] for e in events] == ["video_info", "download", "transcription", "Data saved to database"]
+    assert set(events[-1]["timings"]["stages"]) == {"video_info", "download", "transcription"}
+
+def test_youtube_stream_reports_errors(monkeypatch):
+    def failing_pipeline(youtube_link, report_type, checkpoint=None):
+        yield {"status": "Fetching video info"}
+        raise RuntimeError("video unavailable")
+
+    monkeypatch.setattr(flask_module, "_youtube_analysis_events", failing_pipeline)
+    client = TestClient(asgi.app)
+    response = client.post("/", data={"input_type": "youtube", "youtube_link": "https://youtu.be/x",
+                                      "report_type": "analyst", "mode": "stream"})
+
+    assert _events(response) == [{"status": "Fetching video info"},
+                                 {"status": "Error", "message": "video unavailable"}]
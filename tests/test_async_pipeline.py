@@ -0,0 +1,91 @@
+import os
+import sys
+import asyncio
+import threading
+import subprocess
+from types import SimpleNamespace
+import pytest
+import async_pipeline
+from llm_cache import LLMCache
+
+def test_import_does_not_build_the_client():
+    code = "import sys, async_pipeline; print(async_pipeline.async_client is None, 'openai' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(async_pipeline.__file__)).stdout.split()
+    assert out == ["True", "False"]
+
+def test_client_is_built_once(monkeypatch):
+    built = []
+    monkeypatch.setattr(async_pipeline, "async_client", None)
+    monkeypatch.setattr(async_pipeline, "_build_async_client", lambda: built.append(object()) or built[-1])
+    assert async_pipeline.get_async_client() is async_pipeline.get_async_client()
+    assert len(built) == 1
+
+class FakeAsyncClient:
+    """Async chat completions client; streamed answers arrive one word at a time."""
+
+    def __init__(self, answer="Summary text.", word_delay=0.0):
+        self.answer = answer
+        self.word_delay = word_delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, stream=False, **kwargs):
+        if stream:
+            return self._stream()
+        message = SimpleNamespace(content=self.answer)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    async def _stream(self):
+        for word in self.answer.split(" "):
+            await asyncio.sleep(self.word_delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+@pytest.fixture
+def offline(words, tmp_path, monkeypatch):
+    monkeypatch.setattr(async_pipeline, "cache", LLMCache(str(tmp_path / "llm_cache.db")))
+    client = FakeAsyncClient()
+    monkeypatch.setattr(async_pipeline, "get_async_client", lambda: client)
+    return client
+
+def _run_analysis(build_row, save_row, on_saved=None, pause=0.0, **kwargs):
+    async def collect():
+        events = []
+        async for event in async_pipeline.analysis_events("One. Two. Three.", "analyst", build_row, save_row,
+                                                          on_saved, **kwargs):
+            events.append(event)
+            await asyncio.sleep(pause)
+        return events
+    return asyncio.run(collect())
+
+def test_blocking_work_runs_off_the_event_loop(offline, monkeypatch):
+    threads = {}
+
+    def record(name, result=None):
+        def fn(*args):
+            threads.setdefault(name, threading.current_thread())
+            return result
+        return fn
+
+    monkeypatch.setattr(async_pipeline, "cached_completion", record("cached_completion"))
+
+    async def save_row(row):
+        return 7
+
+    events = _run_analysis(record("build_row", {}), save_row, record("on_saved"))
+    assert events[-1]["analysis_id"] == 7
+    assert set(threads) == {"cached_completion", "build_row", "on_saved"}
+    assert all(thread is not threading.main_thread() for thread in threads.values())
+
+def test_stage_timings_exclude_time_spent_by_the_consumer(offline):
+    offline.answer = "Final summary in several words."
+    offline.word_delay = 0.01
+
+    async def save_row(row):
+        return 1
+
+    # The consumer is slow, and every delta becomes its own event
+    events = _run_analysis(lambda *args: {}, save_row, pause=0.05, delta_interval=0)
+    stages = events[-1]["timings"]["stages"]
+    assert sum(1 for e in events if e.get("type") == "summary_delta") == 5
+    assert 0.04 <= stages["extract_key_takeaways"]["seconds"] < 0.2
+    assert stages["reduce"]["count"] == 1
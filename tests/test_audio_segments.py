@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+import youtube_transcriber
+
+def test_small_files_are_not_split(tmp_path, monkeypatch):
+    audio_file = tmp_path / "audio.webm"
+    audio_file.write_bytes(b"x" * 100)
+    monkeypatch.setattr(youtube_transcriber, "get_audio_duration", lambda path: 1 / 0)
+    assert youtube_transcriber.plan_segments(str(audio_file), max_size_mb=1) is None
+
+def test_cuts_move_back_to_the_last_silence(tmp_path, monkeypatch):
+    audio_file = tmp_path / "audio.webm"
+    audio_file.write_bytes(b"x" * 3000)
+    windows = []
+
+    def find_silence(path, start, end):
+        windows.append((start, end))
+        # Only the first window has pauses; the others are cut at the planned boundary
+        return [start + 2, end - 5] if len(windows) == 1 else []
+
+    monkeypatch.setattr(youtube_transcriber, "get_audio_duration", lambda path: 300.0)
+    monkeypatch.setattr(youtube_transcriber, "find_silence", find_silence)
+    # 1000 bytes per segment: 90 s of the 300 s file, with 10% headroom
+    segments = youtube_transcriber.plan_segments(str(audio_file), max_size_mb=1000 / (1024 * 1024))
+
+    assert segments == [(0.0, 85.0), (85.0, 175.0), (175.0, 265.0), (265.0, 300.0)]
+    assert windows == [(70.0, 90.0), (155.0, 175.0), (245.0, 265.0)]
+
+def test_find_silence_returns_absolute_midpoints(monkeypatch):
+    commands = []
+    stderr = ("[silencedetect @ 0x1] silence_start: 2.5\n"
+              "[silencedetect @ 0x1] silence_end: 3.5 | silence_duration: 1\n"
+              "[silencedetect @ 0x1] silence_start: 8\n")
+
+    def run(command, **kwargs):
+        commands.append(command)
+        return SimpleNamespace(stderr=stderr)
+
+    monkeypatch.setattr(youtube_transcriber.subprocess, "run", run)
+    # The silence still open at the end of the window has no midpoint yet
+    assert youtube_transcriber.find_silence("audio.webm", 100.0, 110.0) == [103.0]
+    # Only the window is decoded
+    assert commands[0][commands[0].index("-ss") + 1] == "100.000"
+    assert commands[0][commands[0].index("-t") + 1] == "10.000"
@@ -0,0 +1,111 @@
+import time
+import pytest
+import jobs
+from jobs import JobStore, JobRunner, JobCheckpoint
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+def _expire(store, job_id):
+    store._execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time() - jobs.JOB_STALE_SECONDS - 1, job_id))
+
+def test_claim_is_exclusive_until_heartbeat_expires(store):
+    job_id = store.create("text", {})
+    assert store.claim(job_id)
+    assert not store.claim(job_id)
+    _expire(store, job_id)
+    assert store.claim(job_id)
+    assert store.get(job_id)["attempts"] == 2
+
+def test_stale_jobs_only_returns_expired_running_jobs(store):
+    queued = store.create("text", {})
+    running = store.create("text", {})
+    crashed = store.create("text", {})
+    store.claim(running)
+    store.claim(crashed)
+    _expire(store, crashed)
+    assert [job_id for job_id, _ in store.stale_jobs()] == [crashed]
+    assert queued not in [job_id for job_id, _ in store.stale_jobs()]
+
+def test_checkpoint_round_trip(store):
+    checkpoint = JobCheckpoint(store, "job")
+    assert checkpoint.get("chunk text") is None
+    checkpoint.save("chunk text", "summary")
+    checkpoint.save_segment("0.000-10.000", "segment text")
+    checkpoint.save_transcript("full transcript")
+    assert checkpoint.get("chunk text") == "summary"
+    assert checkpoint.get_segment("0.000-10.000") == "segment text"
+    assert checkpoint.get_transcript() == "full transcript"
+    assert JobCheckpoint(store, "other").get("chunk text") is None
+
+def test_resumed_job_does_not_log_chunks_twice(store):
+    attempts = []
+
+    def handler(payload, checkpoint):
+        attempts.append(1)
+        for i in range(3):
+            if len(attempts) == 1 and i == 2:
+                raise RuntimeError("worker died")
+            yield {"status": f"Processed chunk {i + 1}", "index": i, "type": "chunk"}
+        yield {"status": "Data saved to database"}
+
+    runner = JobRunner(store, {"text": handler})
+    job_id = store.create("text", {})
+    runner._run(job_id)
+    # Pretend the first attempt crashed instead of failing cleanly, then resume it
+    store._execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+    _expire(store, job_id)
+    runner._run(job_id)
+
+    events = [event for _, event in store.events_after(job_id, 0)]
+    assert [e["index"] for e in events if e.get("type") == "chunk"] == [0, 1, 2]
+    assert events[-2] == {"status": "Data saved to database"}
+    assert store.get(job_id)["status"] == "completed"
+
+def test_runner_starts_on_first_submit(store):
+    runner = JobRunner(store, {"text": lambda payload, checkpoint: iter(())})
+    assert runner._monitor is None
+    job_id = runner.submit("text", {})
+    runner.executor.shutdown(wait=True)
+    assert runner._monitor is not None
+    assert store.get(job_id)["status"] == "completed"
+
+def test_completed_job_keeps_a_slim_log_and_drops_checkpoints(store):
+    def handler(payload, checkpoint):
+        checkpoint.save("chunk text", "summary")
+        checkpoint.save_segment("whole", "segment text")
+        checkpoint.save_transcript("full transcript")
+        yield {"type": "summary_delta", "delta": "Final "}
+        yield {"type": "summary_delta", "delta": "summary"}
+        yield {"status": "Generating title", "type": "summary_complete", "final_summary": "Final summary"}
+        yield {"status": "Complete", "final_summary": "Final summary", "chunk_summaries": ["summary"],
+               "transcript": "full transcript", "type": "final"}
+
+    runner = JobRunner(store, {"text": handler})
+    job_id = store.create("text", {})
+    runner._run(job_id)
+
+    events = [event for _, event in store.events_after(job_id, 0)]
+    assert [e.get("type") for e in events] == ["summary_complete", "final", "done"]
+    assert events[1] == {"status": "Complete", "final_summary": "Final summary", "type": "final"}
+    checkpoint = JobCheckpoint(store, job_id)
+    assert checkpoint.get("chunk text") is None
+    assert checkpoint.get_segment("whole") is None
+    assert checkpoint.get_transcript() is None
+
+def test_prune_removes_only_old_finished_jobs(store):
+    old_done, old_running, recent_done = (store.create("text", {}) for _ in range(3))
+    for job_id in (old_done, recent_done):
+        store.append_event(job_id, {"status": "completed", "type": "done"})
+        store.finish(job_id, "completed")
+    store.claim(old_running)
+    JobCheckpoint(store, old_running).save("chunk text", "summary")
+    store._execute("UPDATE jobs SET created_at = ? WHERE id IN (?, ?)", (time.time() - 3600, old_done, old_running))
+
+    assert store.prune(max_age=60) == 1
+    assert store.get(old_done) is None
+    assert store.events_after(old_done, 0) == []
+    assert store.get(old_running)["status"] == "running"
+    assert JobCheckpoint(store, old_running).get("chunk text") == "summary"
+    assert store.events_after(recent_done, 0)
@@ -0,0 +1,48 @@
+import time
+from llm_cache import LLMCache
+
+def _cache(tmp_path, **kwargs):
+    return LLMCache(str(tmp_path / "llm_cache.db"), **kwargs)
+
+def test_get_and_set(tmp_path):
+    cache = _cache(tmp_path)
+    key = LLMCache.make_key("summarize_chunk", "gpt-4o-mini", "prompt", "chunk", 500, 0.7)
+    assert cache.get(key) is None
+    cache.set(key, "summary")
+    assert cache.get(key) == "summary"
+    assert cache.stats() == {"hits": 1, "misses": 1, "enabled": True}
+
+def test_keys_depend_on_every_part():
+    assert LLMCache.make_key("a", 1) == LLMCache.make_key("a", 1)
+    assert LLMCache.make_key("a", 1) != LLMCache.make_key("a", 2)
+
+def test_delete(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("key", "value")
+    cache.delete("key")
+    assert cache.get("key") is None
+
+def test_expired_entries_miss(tmp_path):
+    cache = _cache(tmp_path, max_age_seconds=60)
+    cache.set("key", "value")
+    with cache._lock:
+        cache._connect().execute("UPDATE completions SET created_at = ?", (time.time() - 120,))
+    assert cache.get("key") is None
+
+def test_evicts_least_recently_used_over_size_budget(tmp_path):
+    cache = _cache(tmp_path, max_bytes=25)
+    cache.set("old", "x" * 10)
+    time.sleep(0.01)
+    cache.set("used", "y" * 10)
+    time.sleep(0.01)
+    cache.get("old")
+    time.sleep(0.01)
+    cache.set("new", "z" * 10)
+    assert cache.get("used") is None
+    assert cache.get("old") == "x" * 10
+    assert cache.get("new") == "z" * 10
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = _cache(tmp_path, enabled=False)
+    cache.set("key", "value")
+    assert cache.get("key") is None
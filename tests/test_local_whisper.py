@@ -0,0 +1,31 @@
+import threading
+import time
+from types import SimpleNamespace
+from local_whisper import WhisperEngine
+
+class FakeModel:
+    device = SimpleNamespace(type="cpu")
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio_file, fp16=True):
+        self.calls.append((audio_file, fp16))
+        time.sleep(0.05)
+        return {"text": f" text of {audio_file} "}
+
+def test_models_are_loaded_once_and_reused(monkeypatch):
+    engine = WhisperEngine(size=2)
+    loaded = []
+    monkeypatch.setattr(engine, "_load", lambda: loaded.append(FakeModel()) or loaded[-1])
+
+    threads = [threading.Thread(target=engine.transcribe, args=(f"{i}.webm",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(loaded) == 2
+    assert sum(len(model.calls) for model in loaded) == 6
+    assert engine.transcribe("a.webm") == "text of a.webm"
+    assert all(fp16 is False for model in loaded for _, fp16 in model.calls)
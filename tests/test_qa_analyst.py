@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+import QA_analyst
+import text_chunker
+from jobs import JobStore, JobCheckpoint
+from llm_cache import LLMCache
+
+class FakeClient:
+    """Chat completions client that answers with queued contents."""
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.contents.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(QA_analyst, "cache", cache)
+    # Token estimates only feed the rate limiter; avoid loading a tokenizer
+    monkeypatch.setattr(QA_analyst, "count_tokens", lambda text, model=None: len(text.split()))
+    return cache
+
+def _use_client(monkeypatch, contents):
+    client = FakeClient(contents)
+    monkeypatch.setattr(QA_analyst, "get_client", lambda: client)
+    return client
+
+TITLE = json.dumps({"title": "Rollups", "subtitle": "Scaling Ethereum"})
+
+def test_title_is_cached(cache, monkeypatch):
+    client = _use_client(monkeypatch, [TITLE])
+    assert QA_analyst.generate_title_subtitle("summary")["title"] == "Rollups"
+    assert QA_analyst.generate_title_subtitle("summary")["title"] == "Rollups"
+    assert client.calls == 1
+
+def test_malformed_title_is_not_cached(cache, monkeypatch):
+    client = _use_client(monkeypatch, ["not json", TITLE])
+    assert QA_analyst.generate_title_subtitle("summary") == QA_analyst.DEFAULT_TITLE
+    assert QA_analyst.generate_title_subtitle("summary")["title"] == "Rollups"
+    assert client.calls == 2
+
+def test_malformed_cached_entry_is_dropped(cache, monkeypatch):
+    prompt = QA_analyst.title_prompt("analyst")
+    key = QA_analyst.completion_key("generate_title_subtitle", "gpt-4", prompt, "summary", 100, 0.7)
+    cache.set(key, "```json\nnot json```")
+    client = _use_client(monkeypatch, [TITLE])
+    assert QA_analyst.generate_title_subtitle("summary")["title"] == "Rollups"
+    assert client.calls == 1
+    assert cache.get(key) == TITLE
+
+def test_client_is_built_once_under_concurrency(monkeypatch):
+    built = []
+
+    def slow_build():
+        time.sleep(0.05)
+        built.append(object())
+        return built[-1]
+
+    monkeypatch.setattr(QA_analyst, "client", None)
+    monkeypatch.setattr(QA_analyst, "_build_client", slow_build)
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(QA_analyst.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(built) == 1
+    assert all(c is built[0] for c in clients)
+
+def test_summarize_chunks_yields_as_chunks_finish(monkeypatch):
+    def summarize_chunk(chunk):
+        # Later chunks finish first
+        time.sleep(0.05 * (3 - int(chunk)))
+        return f"summary {chunk}"
+
+    monkeypatch.setattr(QA_analyst, "summarize_chunk", summarize_chunk)
+    assert list(QA_analyst.summarize_chunks(["0", "1", "2"], max_workers=3)) == [
+        (2, "summary 2"), (1, "summary 1"), (0, "summary 0")]
+
+@pytest.fixture
+def small_chunks(words, monkeypatch):
+    monkeypatch.setattr(text_chunker, "DEFAULT_CHUNK_TOKENS", 5)
+    monkeypatch.setattr(text_chunker, "DEFAULT_OVERLAP_TOKENS", 0)
+
+def test_summarize_stream_starts_before_pieces_run_out(small_chunks, monkeypatch):
+    summarizing = threading.Event()
+
+    def summarize_chunk(chunk):
+        summarizing.set()
+        return "summary of " + chunk
+
+    def pieces():
+        yield "Part 0 of the talk."
+        yield "Part 1 of the talk."
+        # Transcription of the rest only continues once the first chunk is being summarized
+        yield "Part 2 of the talk." if summarizing.wait(5) else "Timed out."
+
+    monkeypatch.setattr(QA_analyst, "summarize_chunk", summarize_chunk)
+    events = list(QA_analyst.summarize_stream(pieces()))
+    assert [e[1] for e in events if e[0] == "segment"][-1] == "Part 2 of the talk."
+    assert sorted(e[1:] for e in events if e[0] == "summary") == [
+        (i, f"summary of Part {i} of the talk.") for i in range(3)]
+    assert ("chunked", 3) in events
+
+def test_summarize_stream_reuses_checkpointed_chunks(small_chunks, tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    checkpoint = JobCheckpoint(store, "job")
+    checkpoint.save("Part 0 of the talk.", "saved summary")
+    summarized = []
+    monkeypatch.setattr(QA_analyst, "summarize_chunk", lambda chunk: summarized.append(chunk) or "new summary")
+
+    events = list(QA_analyst.summarize_stream(["Part 0 of the talk.", "Part 1 of the talk."], checkpoint=checkpoint))
+    assert sorted(e[1:] for e in events if e[0] == "summary") == [(0, "saved summary"), (1, "new summary")]
+    assert summarized == ["Part 1 of the talk."]
+    assert checkpoint.get("Part 1 of the talk.") == "new summary"
+
+def _reduce(summaries, monkeypatch, merge, budget=20):
+    monkeypatch.setitem(QA_analyst.REDUCE_INPUT_BUDGETS, "test-model", budget)
+    monkeypatch.setattr(QA_analyst, "merge_summaries", merge)
+    return list(QA_analyst.reduce_summaries(summaries, model="test-model"))
+
+def test_reduce_merges_batches_within_the_budget(words, monkeypatch):
+    batches = []
+
+    def merge(batch, model, max_tokens, use_cache):
+        batches.append(batch)
+        return f"{batch[0].split()[0]}-{batch[-1].split()[0]} merged"
+
+    # Three words plus the separator each: four summaries fit in a 20-token batch
+    events = _reduce([f"s{i} word word" for i in range(10)], monkeypatch, merge)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert events == [("reduce_level", 1, 10, 3), ("reduced", ["s0-s3 merged", "s4-s7 merged", "s8-s9 merged"])]
+
+def test_reduce_leaves_summaries_that_already_fit(words, monkeypatch):
+    events = _reduce(["short summary"], monkeypatch, lambda *args: 1 / 0)
+    assert events == [("reduced", ["short summary"])]
+
+def test_reduce_stops_after_max_levels(words, monkeypatch):
+    monkeypatch.setattr(QA_analyst, "MAX_REDUCE_LEVELS", 2)
+    # Merges that don't shrink anything would otherwise loop forever
+    events = _reduce([f"s{i} word word" for i in range(10)], monkeypatch, lambda batch, *args: " ".join(batch))
+    assert [event[:2] for event in events[:-1]] == [("reduce_level", 1), ("reduce_level", 2)]
+    assert events[-1][0] == "reduced"
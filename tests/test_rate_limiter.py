@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+import httpx
+import openai
+import pytest
+from rate_limiter import RateLimiter, parse_rate_limits, retry_after_seconds, PRIORITY_CHUNK, PRIORITY_FINAL
+
+def _rate_limit_error(retry_after="0"):
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=httpx.Request("POST", "http://test"))
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+def test_parse_rate_limits():
+    limits = parse_rate_limits("gpt-4=100:2000, whisper-1=10, custom=5:0")
+    assert limits["gpt-4"] == (100, 2000)
+    assert limits["whisper-1"] == (10, 0)
+    assert limits["custom"] == (5, 0)
+    assert limits["gpt-4o"] == parse_rate_limits("")["gpt-4o"]
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(_rate_limit_error("2")) == 2.0
+    assert retry_after_seconds(RuntimeError("no response")) is None
+
+def test_waits_for_tokens_to_refill():
+    limiter = RateLimiter(limits={"m": (6000, 600)})
+    limiter.acquire("m", 600)
+    start = time.monotonic()
+    limiter.acquire("m", 5)
+    # 600 tokens/min refill 10 per second
+    assert time.monotonic() - start >= 0.4
+
+def test_final_report_calls_go_first():
+    limiter = RateLimiter(limits={"m": (6000, 600)})
+    limiter.acquire("m", 600)
+    order = []
+
+    def call(name, priority):
+        limiter.acquire("m", 5, priority)
+        order.append(name)
+
+    chunk = threading.Thread(target=call, args=("chunk", PRIORITY_CHUNK))
+    chunk.start()
+    time.sleep(0.05)
+    final = threading.Thread(target=call, args=("final", PRIORITY_FINAL))
+    final.start()
+    chunk.join(5)
+    final.join(5)
+    assert order == ["final", "chunk"]
+
+def test_call_retries_rate_limit_errors_and_slows_down():
+    limiter = RateLimiter(limits={"m": (6000, 0)}, max_retries=3)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _rate_limit_error()
+        return "ok"
+
+    assert limiter.call("m", 0, PRIORITY_CHUNK, fn) == "ok"
+    assert len(attempts) == 3
+    assert limiter.stats()["m"]["rate_scale"] < 1.0
+
+def test_call_gives_up_after_max_retries():
+    limiter = RateLimiter(limits={"m": (6000, 0)}, max_retries=1)
+
+    def fn():
+        raise _rate_limit_error()
+
+    with pytest.raises(openai.RateLimitError):
+        limiter.call("m", 0, PRIORITY_CHUNK, fn)
+
+def test_non_retryable_errors_are_raised_at_once():
+    limiter = RateLimiter(limits={"m": (6000, 0)}, max_retries=3)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call("m", 0, PRIORITY_CHUNK, fn)
+    assert len(attempts) == 1
+
+def test_call_async():
+    limiter = RateLimiter(limits={"m": (6000, 0)}, max_retries=2)
+    attempts = []
+
+    async def fn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise _rate_limit_error()
+        return "ok"
+
+    assert asyncio.run(limiter.call_async("m", 0, PRIORITY_FINAL, fn)) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,50 @@
+import pytest
+from search_index import PostgresSearch, SQLiteSearchIndex
+
+class MissingColumn(Exception):
+    code = "42703"
+
+class FakeSupabase:
+    """Just enough of the Supabase client for the search_text check."""
+
+    def __init__(self, has_column):
+        self.has_column = has_column
+        self.probes = 0
+
+    def table(self, name):
+        return self
+
+    def select(self, columns):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def execute(self):
+        self.probes += 1
+        if not self.has_column:
+            raise MissingColumn("column summaries.search_text does not exist")
+
+ROW = {"report_title": "Rollups", "final_summary": "Layer two scaling", "created_at": "2024-01-01T00:00:00+00:00",
+       "report_type": "analyst"}
+
+def test_migrated_database_stores_search_text():
+    client = FakeSupabase(has_column=True)
+    search = PostgresSearch(lambda: client)
+    assert search.row_fields(["chunk summary"], "transcript") == {"search_text": "chunk summary\n\ntranscript"}
+    search.row_fields([], "")
+    assert client.probes == 1
+
+def test_missing_column_falls_back_to_the_local_index(tmp_path):
+    client = FakeSupabase(has_column=False)
+    search = PostgresSearch(lambda: client, fallback=SQLiteSearchIndex(str(tmp_path / "search.db")))
+    # Without search_text in the row, the insert is accepted by an un-migrated table
+    assert search.row_fields(["chunk summary"], "transcript") == {}
+    search.index(7, ROW, ["chunk summary"], "transcript")
+    assert [match["id"] for match in search.search("rollups")] == [7]
+    assert client.probes == 1
+
+def test_missing_column_without_fallback_is_a_clear_error():
+    search = PostgresSearch(lambda: FakeSupabase(has_column=False))
+    with pytest.raises(RuntimeError, match="sql/summaries_search.sql"):
+        search.row_fields([], "")
@@ -0,0 +1,92 @@
+import threading
+import pytest
+from storage import SQLiteStorage, WriteBehind
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / "analyses.db"))
+
+def _row(n, **extra):
+    return {"created_at": f"2024-01-{n:02d}T00:00:00+00:00", "final_summary": f"summary {n}",
+            "report_title": f"Report {n}", "report_subtitle": "", "report_type": "analyst", **extra}
+
+def test_insert_and_get(storage):
+    id = storage.insert(_row(1))
+    assert storage.get(id, ["final_summary", "report_title"]) == {"final_summary": "summary 1", "report_title": "Report 1"}
+    assert storage.get(id + 1, ["final_summary"]) is None
+
+def test_unknown_columns_are_rejected(storage):
+    with pytest.raises(ValueError):
+        storage.get(1, ["final_summary; DROP TABLE summaries"])
+
+def test_list_page_follows_cursor(storage):
+    # Two rows share a timestamp, so the id tie-breaker matters
+    ids = [storage.insert(_row(n)) for n in (1, 2, 3)] + [storage.insert(_row(3))]
+    pages, before = [], None
+    while True:
+        page = storage.list_page(["id", "created_at"], 2, before)
+        if not page:
+            break
+        pages.append([row["id"] for row in page])
+        before = (page[-1]["created_at"], page[-1]["id"])
+    assert pages == [[ids[3], ids[2]], [ids[1], ids[0]]]
+
+def test_iter_rows_walks_every_row(storage):
+    ids = [storage.insert(_row(n)) for n in range(1, 8)]
+    assert [row["id"] for row in storage.iter_rows(["id"], batch_size=3)] == ids
+
+def test_search_finds_indexed_reports(storage):
+    row = _row(1, report_title="Pelican migration")
+    id = storage.insert(row)
+    storage.search_index.index(id, row, ["Birds fly south"], "The pelicans left in autumn.")
+    results = storage.search("pelicans")
+    assert [r["id"] for r in results] == [id]
+    assert "<mark>" in results[0]["snippet"]
+    assert storage.search("pelicans -autumn") == []
+
+def test_insert_later_resolves_to_the_new_id(storage):
+    id = storage.insert_later(_row(1)).result(timeout=5)
+    assert storage.get(id, ["report_title"]) == {"report_title": "Report 1"}
+
+class _BlockingWriter:
+    """insert_many that holds the first call until released, so later rows queue up into one batch."""
+
+    def __init__(self, fail_rows=()):
+        self.calls = []
+        self.fail_rows = fail_rows
+        self.release = threading.Event()
+        self.next_id = 0
+
+    def __call__(self, rows):
+        self.calls.append([row["n"] for row in rows])
+        if len(self.calls) == 1:
+            self.release.wait(5)
+        if any(row["n"] in self.fail_rows for row in rows):
+            raise RuntimeError("rejected")
+        ids = list(range(self.next_id, self.next_id + len(rows)))
+        self.next_id += len(rows)
+        return ids
+
+def _submit_queued(writer, rows):
+    first = writer.submit({"n": -1})
+    futures = [writer.submit(row) for row in rows]
+    writer.insert_many.release.set()
+    first.result(timeout=5)
+    return futures
+
+def test_write_behind_batches_by_column_set():
+    insert_many = _BlockingWriter()
+    writer = WriteBehind(insert_many)
+    futures = _submit_queued(writer, [{"n": 1}, {"n": 2, "source_analysis_id": 7}, {"n": 3}])
+    assert sorted(f.result(timeout=5) for f in futures) == [1, 2, 3]
+    assert insert_many.calls == [[-1], [1, 3], [2]]
+
+def test_write_behind_failure_only_affects_failing_row():
+    insert_many = _BlockingWriter(fail_rows=(2,))
+    writer = WriteBehind(insert_many)
+    futures = _submit_queued(writer, [{"n": 1}, {"n": 2}, {"n": 3}])
+    assert isinstance(futures[0].result(timeout=5), int)
+    assert isinstance(futures[2].result(timeout=5), int)
+    with pytest.raises(RuntimeError):
+        futures[1].result(timeout=5)
+    assert insert_many.calls[1:] == [[1, 2, 3], [1], [2], [3]]
@@ -0,0 +1,59 @@
+import pytest
+import text_chunker
+from text_chunker import iter_chunks, iter_stream_chunks
+
+def _sentences(n, words_each=5):
+    return " ".join(f"Sentence {i} has {'word ' * (words_each - 4)}end." for i in range(n))
+
+def test_chunks_stay_within_budget_and_cut_at_sentences(words):
+    text = _sentences(20)
+    chunks = list(iter_chunks(text, max_tokens=12, overlap_tokens=0))
+    assert len(chunks) > 1
+    assert all(len(chunk.split()) <= 12 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == text
+
+def test_overlap_repeats_trailing_sentences(words):
+    chunks = list(iter_chunks(_sentences(10), max_tokens=10, overlap_tokens=5))
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.startswith(previous.split(". ")[-1].rstrip("."))
+
+def test_paragraph_breaks_are_preferred_when_nearly_full(words):
+    text = _sentences(3) + "\n\n" + _sentences(3)
+    assert list(iter_chunks(text, max_tokens=16, overlap_tokens=0)) == [_sentences(3), _sentences(3)]
+
+def test_unpunctuated_text_falls_back_to_words(words):
+    chunks = list(iter_chunks("word " * 25, max_tokens=10, overlap_tokens=0))
+    assert [len(chunk.split()) for chunk in chunks] == [10, 10, 5]
+
+def test_stream_chunks_match_whole_text(words):
+    text = _sentences(40)
+    # Transcription segments end on word boundaries, not necessarily on sentences
+    words = text.split()
+    pieces = [" ".join(words[i:i + 7]) for i in range(0, len(words), 7)]
+    streamed = list(iter_stream_chunks(pieces, max_tokens=12, overlap_tokens=0))
+    assert all(len(chunk.split()) <= 12 for chunk in streamed)
+    assert " ".join(streamed).split() == text.split()
+
+def test_stream_chunks_are_yielded_while_pieces_arrive(words):
+    consumed = []
+
+    def pieces():
+        for i in range(30):
+            consumed.append(i)
+            yield _sentences(1)
+
+    stream = iter_stream_chunks(pieces(), max_tokens=12, overlap_tokens=0)
+    first = next(stream)
+    assert first == " ".join([_sentences(1)] * 2)
+    assert len(consumed) < 30
+    assert len(list(stream)) == 14
+
+def test_real_tokenizer_budget():
+    try:
+        text_chunker.get_encoding("gpt-4o-mini")
+    except Exception as e:
+        pytest.skip(f"tiktoken encoding unavailable offline: {e}")
+    text = _sentences(500, words_each=12)
+    chunks = list(iter_chunks(text, model="gpt-4o-mini", max_tokens=200, overlap_tokens=0))
+    assert all(text_chunker.count_tokens(chunk) <= 200 for chunk in chunks)
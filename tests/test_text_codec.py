@@ -0,0 +1,20 @@
+from text_codec import compress_text, decompress_text, iter_decompressed, is_compressed
+
+TEXT = "Grüße aus Köln — 東京 " * 2000
+
+def test_round_trip():
+    stored = compress_text(TEXT)
+    assert is_compressed(stored)
+    assert len(stored) < len(TEXT)
+    assert decompress_text(stored) == TEXT
+
+def test_uncompressed_values_pass_through():
+    assert decompress_text("plain transcript") == "plain transcript"
+    assert decompress_text(None) is None
+    assert "".join(iter_decompressed("plain transcript", chunk_size=4)) == "plain transcript"
+    assert list(iter_decompressed(None)) == []
+
+def test_iter_decompressed_handles_split_multibyte_characters():
+    pieces = list(iter_decompressed(compress_text(TEXT), chunk_size=7))
+    assert len(pieces) > 1
+    assert "".join(pieces) == TEXT
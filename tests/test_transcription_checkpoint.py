@@ -0,0 +1,30 @@
+import youtube_transcriber
+from jobs import JobStore, JobCheckpoint
+
+def test_checkpointed_segments_are_not_transcribed_again(tmp_path, monkeypatch):
+    audio_file = tmp_path / "audio.webm"
+    audio_file.write_bytes(b"audio")
+    transcribed = []
+
+    def fake_transcribe(path):
+        transcribed.append(path)
+        return f"text {len(transcribed)}"
+
+    monkeypatch.setattr(youtube_transcriber, "prepare_for_upload", lambda path: path)
+    monkeypatch.setattr(youtube_transcriber, "plan_segments", lambda path: [(0.0, 10.0), (10.0, 20.0), (20.0, 30.0)])
+    def fake_cut(path, start, end, index):
+        segment = tmp_path / f"{index}.webm"
+        segment.write_bytes(b"segment")
+        return str(segment)
+
+    monkeypatch.setattr(youtube_transcriber, "cut_segment", fake_cut)
+    monkeypatch.setattr(youtube_transcriber, "transcribe_file", fake_transcribe)
+
+    checkpoint = JobCheckpoint(JobStore(str(tmp_path / "jobs.db")), "job")
+    checkpoint.save_segment("10.000-20.000", "from the first attempt")
+    texts = list(youtube_transcriber.transcribe_audio_stream(str(audio_file), checkpoint=checkpoint))
+
+    assert texts[1] == "from the first attempt"
+    assert len(transcribed) == 2
+    assert checkpoint.get_segment("0.000-10.000") is not None
+    assert checkpoint.get_segment("20.000-30.000") is not None
@@ -0,0 +1,57 @@
+import os
+import pytest
+import yt_dlp
+import youtube_transcriber
+
+def _video_info():
+    return {
+        "id": "vid1", "title": "Talk", "extractor": "youtube", "extractor_key": "Youtube",
+        "webpage_url": "https://www.youtube.com/watch?v=vid1",
+        "formats": [
+            {"format_id": "v", "url": "https://media.test/v", "ext": "mp4", "vcodec": "avc1", "acodec": "none",
+             "tbr": 1000, "width": 1280, "height": 720},
+            {"format_id": "opus-low", "url": "https://media.test/opus-low", "ext": "webm", "vcodec": "none",
+             "acodec": "opus", "abr": 50},
+            {"format_id": "opus-high", "url": "https://media.test/opus-high", "ext": "webm", "vcodec": "none",
+             "acodec": "opus", "abr": 160},
+            {"format_id": "m4a", "url": "https://media.test/m4a", "ext": "m4a", "vcodec": "none",
+             "acodec": "mp4a.40.2", "abr": 128},
+        ],
+    }
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Record the URLs yt-dlp downloads instead of fetching them."""
+    urls = []
+
+    def fake_dl(self, name, info, subtitle=False, test=False):
+        urls.append(info["url"])
+        with open(name, "wb") as f:
+            f.write(b"audio")
+        return True, True
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, "dl", fake_dl)
+    return urls
+
+def test_downloads_only_the_smallest_opus_stream(tmp_path, fetched, monkeypatch):
+    monkeypatch.setattr(youtube_transcriber, "AUDIO_INGEST", "native")
+    path = youtube_transcriber.download_youtube_audio("https://youtu.be/vid1", _video_info(), str(tmp_path))
+    assert fetched == ["https://media.test/opus-low"]
+    assert os.path.basename(path) == "vid1.webm"
+
+def test_reused_metadata_does_not_pull_in_the_video_stream(tmp_path, fetched, monkeypatch):
+    monkeypatch.setattr(youtube_transcriber, "AUDIO_INGEST", "native")
+    # Metadata that already went through yt-dlp's default format selection (bestvideo+bestaudio)
+    with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+        processed = ydl.process_ie_result(_video_info(), download=False)
+    assert processed.get("requested_formats")
+    youtube_transcriber.download_youtube_audio("https://youtu.be/vid1", processed, str(tmp_path))
+    assert fetched == ["https://media.test/opus-low"]
+
+def test_falls_back_to_m4a_without_opus(tmp_path, fetched, monkeypatch):
+    monkeypatch.setattr(youtube_transcriber, "AUDIO_INGEST", "native")
+    info = _video_info()
+    info["formats"] = [f for f in info["formats"] if f["acodec"] != "opus"]
+    path = youtube_transcriber.download_youtube_audio("https://youtu.be/vid1", info, str(tmp_path))
+    assert fetched == ["https://media.test/m4a"]
+    assert path.endswith(".m4a")
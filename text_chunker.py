@@ -0,0 +1,129 @@
+import os
+import re
+from functools import lru_cache
+import tiktoken
+
+# Per-model token budget for a single chunk sent to summarize_chunk. Leaves room
+# for the system prompt and the completion inside each model's context window.
+CHUNK_TOKEN_BUDGETS = {
+    "gpt-4o-mini": 12000,
+    "gpt-4o": 12000,
+    "gpt-4": 5000,
+    "gpt-3.5-turbo": 10000,
+}
+DEFAULT_CHUNK_TOKENS = int(os.getenv('CHUNK_TOKENS', '0')) or None
+DEFAULT_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', '0'))
+
+# Fill ratio after which a paragraph break is preferred over packing more text in
+PARAGRAPH_FLUSH_RATIO = 0.8
+
+_PARAGRAPH_RE = re.compile(r'(.+?)(?:\n[ \t]*\n\s*|\Z)', re.S)
+_SENTENCE_RE = re.compile(r'.+?(?:[.!?…]+["\'”’)\]]*(?=\s)|\Z)', re.S)
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    """Return the tiktoken encoding for a model, falling back to cl100k_base for unknown models."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text, model="gpt-4o-mini"):
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+def token_budget(model):
+    """Chunk size in tokens for a model, honouring the CHUNK_TOKENS override."""
+    return DEFAULT_CHUNK_TOKENS or CHUNK_TOKEN_BUDGETS.get(model, 6000)
+
+def _iter_units(text, encoding, max_tokens):
+    """Yield (text, tokens, ends_paragraph) for each sentence, lazily walking the input."""
+    for paragraph in _PARAGRAPH_RE.finditer(text):
+        sentences = [m.group(0).strip() for m in _SENTENCE_RE.finditer(paragraph.group(1))]
+        sentences = [s for s in sentences if s]
+        for i, sentence in enumerate(sentences):
+            ends_paragraph = i == len(sentences) - 1
+            tokens = len(encoding.encode(" " + sentence, disallowed_special=()))
+            if tokens <= max_tokens:
+                yield sentence, tokens, ends_paragraph
+                continue
+            # A single "sentence" larger than the budget (e.g. unpunctuated text): fall back to words
+            words, size = [], 0
+            for word in sentence.split():
+                word_tokens = len(encoding.encode(" " + word, disallowed_special=()))
+                if words and size + word_tokens > max_tokens:
+                    yield " ".join(words), size, False
+                    words, size = [], 0
+                words.append(word)
+                size += word_tokens
+            if words:
+                yield " ".join(words), size, ends_paragraph
+
+def _join(units):
+    parts = []
+    for text, _, ends_paragraph in units:
+        parts.append(text)
+        parts.append("\n\n" if ends_paragraph else " ")
+    return "".join(parts).strip()
+
+def iter_chunks(text, model="gpt-4o-mini", max_tokens=None, overlap_tokens=None):
+    """Yield chunks of at most max_tokens real tokens, cut at sentence or paragraph boundaries.
+
+    Consecutive chunks share up to overlap_tokens of trailing sentences for context.
+    """
+    max_tokens = max_tokens or token_budget(model)
+    overlap_tokens = DEFAULT_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    encoding = get_encoding(model)
+
+    current, size, fresh = [], 0, 0
+    for unit in _iter_units(text, encoding, max_tokens):
+        if current and size + unit[1] > max_tokens:
+            yield _join(current)
+            current, size = _overlap(current, overlap_tokens)
+            while current and size + unit[1] > max_tokens:
+                size -= current.pop(0)[1]
+            fresh = 0
+        current.append(unit)
+        size += unit[1]
+        fresh += 1
+        if unit[2] and size >= max_tokens * PARAGRAPH_FLUSH_RATIO:
+            yield _join(current)
+            current, size = _overlap(current, overlap_tokens)
+            fresh = 0
+    # Only emit the tail if it holds something beyond the overlap carried from the last chunk
+    if current and fresh:
+        yield _join(current)
+
+def _overlap(units, overlap_tokens):
+    tail, size = [], 0
+    for unit in reversed(units):
+        if size + unit[1] > overlap_tokens:
+            break
+        tail.insert(0, unit)
+        size += unit[1]
+    return tail, size
+
+def iter_stream_chunks(pieces, model="gpt-4o-mini", max_tokens=None, overlap_tokens=None):
+    """Like iter_chunks, but over an iterable of text pieces (e.g. transcription segments).
+
+    Full chunks are yielded as soon as enough text has arrived; the partial tail is
+    carried over and re-packed with the next pieces.
+    """
+    max_tokens = max_tokens or token_budget(model)
+    buffer = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer = f"{buffer} {piece}" if buffer else piece
+        # Cheap character check first so we don't re-tokenize the buffer on every small segment
+        if len(buffer) < max_tokens * 2 or count_tokens(buffer, model) < max_tokens:
+            continue
+        # Hold back one chunk at a time; the last one is the tail that more pieces may extend
+        last = ""
+        for chunk in iter_chunks(buffer, model=model, max_tokens=max_tokens, overlap_tokens=overlap_tokens):
+            if last:
+                yield last
+            last = chunk
+        buffer = last
+    if buffer:
+        yield from iter_chunks(buffer, model=model, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
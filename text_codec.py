@@ -0,0 +1,38 @@
+import gzip
+import zlib
+import base64
+import codecs
+
+# Version marker for compressed column values. Rows written before compression
+# was introduced have no marker and are returned unchanged.
+GZIP_PREFIX = "gz1:"
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+def compress_text(text):
+    """Gzip and base64-encode text for storage in a text column."""
+    return GZIP_PREFIX + base64.b64encode(gzip.compress(text.encode('utf-8'), compresslevel=6)).decode('ascii')
+
+def is_compressed(value):
+    return isinstance(value, str) and value.startswith(GZIP_PREFIX)
+
+def decompress_text(value):
+    if not is_compressed(value):
+        return value
+    return gzip.decompress(base64.b64decode(value[len(GZIP_PREFIX):])).decode('utf-8')
+
+def iter_decompressed(value, chunk_size=DECOMPRESS_CHUNK_SIZE):
+    """Yield the decompressed text piece by piece so large transcripts never sit fully in memory twice."""
+    if not is_compressed(value):
+        for i in range(0, len(value or ""), chunk_size):
+            yield value[i:i + chunk_size]
+        return
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    data = base64.b64decode(value[len(GZIP_PREFIX):])
+    for i in range(0, len(data), chunk_size):
+        text = decoder.decode(decompressor.decompress(data[i:i + chunk_size]))
+        if text:
+            yield text
+    text = decoder.decode(decompressor.flush(), final=True)
+    if text:
+        yield text
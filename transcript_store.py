@@ -0,0 +1,69 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class TranscriptStore:
+    """SQLite store of finished transcripts, keyed by YouTube video ID and audio content hash."""
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts ("
+                "video_id TEXT, audio_hash TEXT, transcript TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS transcripts_video_id ON transcripts (video_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS transcripts_audio_hash ON transcripts (audio_hash)")
+            self._conn.commit()
+        return self._conn
+
+    def _lookup(self, column, value):
+        if not self.enabled or not value:
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT transcript FROM transcripts WHERE {column} = ? ORDER BY created_at DESC LIMIT 1", (value,)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def get_by_video_id(self, video_id):
+        return self._lookup("video_id", video_id)
+
+    def get_by_audio_hash(self, audio_hash):
+        return self._lookup("audio_hash", audio_hash)
+
+    def save(self, video_id, audio_hash, transcript):
+        if not self.enabled or not transcript:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, audio_hash, transcript, created_at) VALUES (?, ?, ?, ?)",
+                (video_id, audio_hash, transcript, time.time())
+            )
+            conn.commit()
+        logger.info(f"Stored transcript for video {video_id}")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "enabled": self.enabled}
+
+transcript_store = TranscriptStore(
+    os.getenv('TRANSCRIPT_STORE_PATH', 'transcripts.db'),
+    enabled=os.getenv('TRANSCRIPT_STORE_DISABLED', '').lower() not in ('1', 'true', 'yes'),
+)
@@ -1,82 +1,346 @@
-import yt_dlp
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
 import tempfile
-from pydub import AudioSegment
-import math
+import shutil
+import re
+import subprocess
+import threading
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from transcript_store import transcript_store
+import metrics
+from rate_limiter import rate_limiter, PRIORITY_CHUNK
+
+logger = logging.getLogger(__name__)
 
-# Initialize the OpenAI client
 load_dotenv() 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Created on first use so importing this module doesn't load the openai package
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        # Several pool threads can ask at once; only one builds the client
+        with _client_lock:
+            if client is None:
+                client = _build_client()
+    return client
+
+def _build_client():
+    import httpx
+    from openai import OpenAI
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # Retries are scheduled by rate_limiter so they respect the shared limits
+        max_retries=0,
+        http_client=httpx.Client(event_hooks={'response': [metrics.count_retryable_response]})
+    )
+
+# Number of audio segments transcribed in parallel
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+# "api" (OpenAI whisper-1), "local" (local_whisper), or "auto" (API, falling back to local on failure)
+TRANSCRIBE_BACKEND = os.getenv("TRANSCRIBE_BACKEND", "api")
+# How far back from a planned cut point to look for silence, in seconds
+SILENCE_SEARCH_WINDOW = 20
+SILENCE_NOISE = "-35dB"
+SILENCE_MIN_DURATION = 0.4
+
+# "native" keeps YouTube's own opus/m4a stream; "mp3" re-encodes it to 192 kbps MP3 as before
+AUDIO_INGEST = os.getenv("AUDIO_INGEST", "native")
+# Smallest audio-only stream, preferring opus: speech doesn't need more than YouTube's lowest tier
+NATIVE_AUDIO_FORMAT = "worstaudio[acodec=opus]/worstaudio[ext=m4a]/bestaudio"
+# Containers the Whisper API accepts as uploaded
+API_AUDIO_EXTENSIONS = {".flac", ".m4a", ".mp3", ".mp4", ".mpeg", ".mpga", ".oga", ".ogg", ".wav", ".webm"}
+# Whisper API upload limit (25 MB) less some headroom
+MAX_UPLOAD_MB = 24
+# Re-encode settings when a native stream doesn't fit the upload limit; Whisper works on 16 kHz mono anyway
+COMPACT_AUDIO_BITRATE = "24k"
+
+# Bump when audio_fingerprint hashes something different. v2 hashes the native stream's packets;
+# unversioned hashes were over 16 kHz mono PCM decoded from the old MP3 downloads.
+AUDIO_HASH_VERSION = "v2"
+
+_SILENCE_RE = re.compile(r"silence_(start|end): (-?[\d.]+)")
+
+def get_video_info(youtube_url):
+    """Fetch video metadata (id, title, duration, ...) without downloading any media.
+
+    process=False skips format selection, so download_youtube_audio can pick
+    the audio format itself when it reuses this dict.
+    """
+    import yt_dlp
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        return ydl.extract_info(youtube_url, download=False, process=False)
+
+def audio_fingerprint(audio_file):
+    """Hash the encoded audio stream, so the same upload matches whatever container it arrives in.
 
-def download_youtube_audio(youtube_url):
-    """Download audio from a YouTube video."""
+    This is an exact match, not a perceptual one: a lossy re-encode of the same
+    content (e.g. a re-upload that YouTube transcoded again) hashes differently.
+    The packets are stream-copied into ffmpeg's hash muxer, so nothing is decoded.
+    Hashes are versioned because what gets hashed has changed before: entries
+    written under an older scheme simply never match and are only found by video ID.
+    """
+    output = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", audio_file, "-map", "0:a:0",
+         "-c", "copy", "-f", "hash", "-hash", "sha256", "-"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return f"{AUDIO_HASH_VERSION}:{output.strip().split('=', 1)[-1]}"
+
+@contextmanager
+def job_temp_dir():
+    """Per-job scratch directory for downloaded audio and segments, removed however the job ends."""
+    path = tempfile.mkdtemp(prefix="insights-audio-")
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+# Keys yt-dlp fills in when it selects a format; stale ones make it download those formats
+_SELECTED_FORMAT_KEYS = ('requested_formats', 'requested_downloads', 'format_id', 'format',
+                         'url', 'ext', 'protocol')
+
+def download_youtube_audio(youtube_url, info=None, output_dir="."):
+    """Download the audio of a YouTube video into output_dir and return the file path.
+
+    With AUDIO_INGEST=native the smallest native audio stream is saved as-is
+    (usually opus in webm), so nothing is transcoded.
+    """
+    import yt_dlp
     ydl_opts = {
-        'format': 'bestaudio/best',
-        'postprocessors': [{
+        'quiet': True,
+        'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
+    }
+    if AUDIO_INGEST == "mp3":
+        ydl_opts['format'] = 'bestaudio/best'
+        ydl_opts['postprocessors'] = [{
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': '192',
-        }],
-        'outtmpl': '%(id)s.%(ext)s',
-    }
+        }]
+    else:
+        ydl_opts['format'] = NATIVE_AUDIO_FORMAT
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(youtube_url, download=True)
-        filename = f"{info['id']}.mp3"
-    return filename
+        if info is None:
+            info = ydl.extract_info(youtube_url, download=True)
+        else:
+            # Reuse metadata we already fetched instead of extracting it again,
+            # dropping any earlier format selection (e.g. bestvideo+bestaudio)
+            info = {k: v for k, v in info.items() if k not in _SELECTED_FORMAT_KEYS}
+            info = ydl.process_ie_result(info, download=True)
+    # filepath is updated by postprocessors, so it also covers the mp3 case
+    return info['requested_downloads'][0]['filepath']
+
+def compact_audio(audio_file):
+    """Re-encode to low-bitrate mono opus next to the original, for streams too big to upload as-is."""
+    base, _ = os.path.splitext(audio_file)
+    compact_file = f"{base}_compact.ogg"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", audio_file, "-vn",
+         "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", COMPACT_AUDIO_BITRATE, compact_file],
+        check=True
+    )
+    return compact_file
+
+def prepare_for_upload(audio_file, backend=None, max_size_mb=MAX_UPLOAD_MB):
+    """Return the file to send to the Whisper API: the original when it can be uploaded as-is.
 
-def split_audio(audio_file, max_size_mb=24):
-    audio = AudioSegment.from_mp3(audio_file)
+    Native streams are only re-encoded when the API wouldn't accept the
+    container or the file is over the upload limit; the local backend reads
+    anything ffmpeg can decode.
+    """
+    if (backend or TRANSCRIBE_BACKEND) == "local":
+        return audio_file
+    extension = os.path.splitext(audio_file)[1].lower()
+    if extension in API_AUDIO_EXTENSIONS and os.path.getsize(audio_file) <= max_size_mb * 1024 * 1024:
+        return audio_file
+    with metrics.timed("audio_compact"):
+        compact_file = compact_audio(audio_file)
+    logger.info(f"Re-encoded {os.path.basename(audio_file)} ({os.path.getsize(audio_file) / 1e6:.1f} MB) "
+                f"to {os.path.getsize(compact_file) / 1e6:.1f} MB mono for upload")
+    return compact_file
+
+def get_audio_duration(audio_file):
+    """Return the duration of an audio file in seconds using ffprobe (no decoding)."""
+    output = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+         "-of", "default=noprint_wrappers=1:nokey=1", audio_file],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip())
+
+def find_silence(audio_file, start, end):
+    """Return the midpoints of silent stretches between start and end (seconds).
+
+    Only the requested window is decoded, so memory and time don't grow with file length.
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+         "-i", audio_file, "-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_DURATION}",
+         "-f", "null", "-"],
+        capture_output=True, text=True
+    )
+    midpoints = []
+    silence_start = None
+    for kind, value in _SILENCE_RE.findall(result.stderr):
+        if kind == "start":
+            silence_start = float(value)
+        elif silence_start is not None:
+            midpoints.append(start + (silence_start + float(value)) / 2)
+            silence_start = None
+    return midpoints
+
+def plan_segments(audio_file, max_size_mb=MAX_UPLOAD_MB):
+    """Plan (start, end) times so each stream-copied segment stays under max_size_mb.
+
+    Cuts are moved back to the nearest silence before each planned boundary so words
+    aren't split across segments.
+    """
     max_size_bytes = max_size_mb * 1024 * 1024
     file_size = os.path.getsize(audio_file)
-    
     if file_size <= max_size_bytes:
-        return [audio_file]  # Return the original file if it's small enough
-    
-    duration_ms = len(audio)
-    chunk_duration_ms = math.floor((max_size_bytes / file_size) * duration_ms)
-    
-    chunks = []
-    for i in range(0, duration_ms, chunk_duration_ms):
-        chunk = audio[i:i+chunk_duration_ms]
-        chunk_file = f"{audio_file[:-4]}_chunk_{len(chunks)}.mp3"
-        chunk.export(chunk_file, format="mp3")
-        chunks.append(chunk_file)
-    
-    return chunks
-
-def transcribe_audio_stream(audio_file):
-    """Transcribe audio file using OpenAI's Whisper API and yield results."""
+        return None
+
+    duration = get_audio_duration(audio_file)
+    # Leave headroom for container overhead and bitrate variation
+    segment_duration = 0.9 * duration * max_size_bytes / file_size
+
+    segments = []
+    start = 0.0
+    while duration - start > segment_duration:
+        target = start + segment_duration
+        window_start = max(start + 1, target - SILENCE_SEARCH_WINDOW)
+        silences = find_silence(audio_file, window_start, target)
+        cut = silences[-1] if silences else target
+        segments.append((start, cut))
+        start = cut
+    segments.append((start, duration))
+    return segments
+
+def cut_segment(audio_file, start, end, index):
+    """Stream-copy [start, end) of the audio into its own file without re-encoding."""
+    base, ext = os.path.splitext(audio_file)
+    segment_file = f"{base}_chunk_{index}{ext}"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}",
+         "-i", audio_file, "-vn", "-c", "copy", segment_file],
+        check=True
+    )
+    return segment_file
+
+def split_audio(audio_file, max_size_mb=MAX_UPLOAD_MB):
+    """Split audio into files under max_size_mb, returning the original file if it's small enough."""
+    segments = plan_segments(audio_file, max_size_mb)
+    if segments is None:
+        return [audio_file]
+    return [cut_segment(audio_file, start, end, i) for i, (start, end) in enumerate(segments)]
+
+def transcribe_file(audio_file, backend=None):
+    """Transcribe a single audio file with the configured backend."""
+    backend = backend or TRANSCRIBE_BACKEND
+    if backend == "local":
+        return transcribe_file_local(audio_file)
+    try:
+        return transcribe_file_api(audio_file)
+    except Exception as e:
+        if backend != "auto":
+            raise
+        logger.warning(f"Whisper API failed ({e}); transcribing locally")
+        return transcribe_file_local(audio_file)
+
+def transcribe_file_api(audio_file):
+    """Transcribe a single audio file with the Whisper API."""
+    def request():
+        # Reopened on every attempt so a retry uploads the whole file again
+        with open(audio_file, "rb") as audio:
+            return get_client().audio.transcriptions.create(
+                model="whisper-1",
+                file=audio,
+                response_format="text"
+            )
+
+    with metrics.timed("transcription"):
+        try:
+            response = rate_limiter.call("whisper-1", 0, PRIORITY_CHUNK, request)
+        except Exception:
+            metrics.openai_requests.inc(model="whisper-1", operation="transcription", outcome="error")
+            raise
+    metrics.openai_requests.inc(model="whisper-1", operation="transcription", outcome="ok")
+    return response
+
+def transcribe_file_local(audio_file):
+    """Transcribe a single audio file with the in-process Whisper model pool."""
+    from local_whisper import engine
+    with metrics.timed("transcription"):
+        return engine.transcribe(audio_file)
+
+def _transcribe_segment(audio_file, start, end, index, checkpoint=None):
+    span = f"{start:.3f}-{end:.3f}"
+    if checkpoint is not None:
+        text = checkpoint.get_segment(span)
+        if text is not None:
+            return text
+    with metrics.timed("audio_split"):
+        segment_file = cut_segment(audio_file, start, end, index)
+    try:
+        text = transcribe_file(segment_file)
+    finally:
+        os.remove(segment_file)
+    if checkpoint is not None:
+        checkpoint.save_segment(span, text)
+    return text
+
+def transcribe_audio_stream(audio_file, max_workers=None, checkpoint=None):
+    """Transcribe audio file using OpenAI's Whisper API and yield results.
+
+    Segments are cut and transcribed concurrently, and yielded in playback order.
+    If a checkpoint is given (see jobs.JobCheckpoint), segments it already holds
+    are not transcribed again and new ones are saved to it.
+    """
+    max_workers = max_workers or TRANSCRIBE_WORKERS
     try:
-        chunks = split_audio(audio_file)
-        for chunk in chunks:
-            with open(chunk, "rb") as audio:
-                response = client.audio.transcriptions.create(
-                    model="whisper-1", 
-                    file=audio,
-                    response_format="text"
-                )
-            yield response
-            if chunk != audio_file:  # Only remove if it's a chunk, not the original file
-                os.remove(chunk)
+        audio_file = prepare_for_upload(audio_file)
+        with metrics.timed("audio_split"):
+            segments = plan_segments(audio_file)
+        if segments is None:
+            text = checkpoint.get_segment("whole") if checkpoint is not None else None
+            if text is None:
+                text = transcribe_file(audio_file)
+                if checkpoint is not None:
+                    checkpoint.save_segment("whole", text)
+            yield text
+            return
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            futures = [
+                metrics.submit(executor, _transcribe_segment, audio_file, start, end, i, checkpoint)
+                for i, (start, end) in enumerate(segments)
+            ]
+            for future in futures:
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
     except Exception as e:
-        print(f"Error in transcription: {str(e)}")
-        yield None
+        logger.error(f"Error in transcription: {str(e)}")
+        raise
 
 def process_youtube_video(youtube_url):
     """Process a YouTube video: download audio and transcribe."""
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            original_dir = os.getcwd()
-            os.chdir(temp_dir)
-            
-            audio_file = download_youtube_audio(youtube_url)
-            transcript = " ".join(list(transcribe_audio_stream(audio_file)))
-            
-            os.chdir(original_dir)
-            
+        info = get_video_info(youtube_url)
+        transcript = transcript_store.get_by_video_id(info['id'])
+        if transcript is None:
+            with job_temp_dir() as temp_dir:
+                audio_file = download_youtube_audio(youtube_url, info, temp_dir)
+                audio_hash = audio_fingerprint(audio_file)
+                transcript = transcript_store.get_by_audio_hash(audio_hash)
+                if transcript is None:
+                    transcript = " ".join(list(transcribe_audio_stream(audio_file)))
+                transcript_store.save(info['id'], audio_hash, transcript)
         return transcript
     except Exception as e:
         print(f"Error processing YouTube video: {str(e)}")
-        return None
\ No newline at end of file
+        return None